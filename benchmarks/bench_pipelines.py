@@ -0,0 +1,377 @@
+"""Benchmarks for the data loading, preprocessing and training hot paths.
+
+Every benchmark runs at several row scales (1x, 10x and 100x the bundled
+CSVs by default, the larger ones generated with `common.synthetic`) so the
+output shows how each stage grows with data size:
+
+    python benchmarks/bench_pipelines.py
+    python benchmarks/bench_pipelines.py --scales 1 10 --only rice
+    python benchmarks/bench_pipelines.py --json bench.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import statistics
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+from common import csv_reader
+from common import regression
+from common import sampling
+from common import synthetic
+from common import timestamps
+
+TAXI_CSV = synthetic.DATASETS['taxi']
+RICE_CSV = synthetic.DATASETS['rice']
+HOUSING_CSV = synthetic.DATASETS['housing']
+
+
+def load_script(relative_path):
+    """Imports one of the hyphen-named scripts as a module without running main()."""
+    path = ROOT / relative_path
+    name = path.stem.replace('-', '_')
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+def scale_rows(df, factor, seed=0):
+    """Synthetic frame with `factor` times the rows and the same distributions."""
+    if factor == 1:
+        return df
+    model = synthetic.SyntheticModel.fit(df)
+    return model.sample(len(df) * factor, np.random.default_rng(seed))
+
+
+class Benchmark:
+    """`rows` is how many rows one run processes; None for lookups that
+    only touch a few cells or neighbours, which are reported as latency."""
+
+    def __init__(self, name, setup, run, rows):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.rows = rows
+
+
+def warm_up(model, fit):
+    """Calls `fit(model)` once so timed epochs do not include tracing the train step."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        fit(model)
+    return model
+
+
+def warm_up_rows(rows, batch_size):
+    """Rows of a warm-up fit whose batches have the shapes of a full epoch's."""
+    return batch_size + rows % batch_size
+
+
+def csv_benchmarks(scale, workdir):
+    benchmarks = []
+    for name, path in synthetic.DATASETS.items():
+        if scale == 1:
+            scaled_path = path
+            rows = len(pd.read_csv(path))
+        else:
+            scaled_path = Path(workdir) / '{}_{}x.csv'.format(name, scale)
+            model = synthetic.SyntheticModel.fit(pd.read_csv(path))
+            rows = model.row_count * scale
+            model.write_csv(scaled_path, rows)
+        for engine in csv_reader.available_engines():
+            benchmarks.append(Benchmark(
+                'load_csv[{}:{}]'.format(name, engine),
+                setup=lambda p=scaled_path: p,
+                run=lambda p, e=engine: csv_reader.read_csv(p, engine=e),
+                rows=rows,
+            ))
+    return benchmarks
+
+
+def rice_benchmarks(scale):
+    import ml_edu.experiment
+
+    script = load_script('binary-classification/binary-classification.py')
+    rice_dataset = scale_rows(script.load_dataset(RICE_CSV), scale)
+    normalized_dataset = script.normalize_dataset(rice_dataset)
+    train_data, _, _ = script.split_dataset(normalized_dataset)
+    train_features, train_labels = script.split_features_labels(train_data)
+
+    settings = ml_edu.experiment.ExperimentSettings(
+        learning_rate=0.001,
+        number_epochs=1,
+        batch_size=100,
+        classification_threshold=0.35,
+        input_features=script.input_features,
+    )
+
+    def one_epoch(model):
+        script.train_model('bench', model, train_features, train_labels, settings)
+
+    warm_up_size = warm_up_rows(len(train_features), settings.batch_size)
+
+    def warm_up_fit(model):
+        script.train_model('bench', model, train_features.iloc[:warm_up_size], train_labels[:warm_up_size],
+                           settings)
+
+    return [
+        Benchmark('rice_normalize', lambda: rice_dataset, script.normalize_dataset, len(rice_dataset)),
+        Benchmark('rice_split', lambda: normalized_dataset, script.split_dataset, len(rice_dataset)),
+        Benchmark(
+            'rice_train_epoch',
+            setup=lambda: warm_up(script.create_model(settings, script.create_metrics(settings)), warm_up_fit),
+            run=one_epoch,
+            rows=len(train_features),
+        ),
+    ]
+
+
+def taxi_benchmarks(scale):
+    script = load_script('linear-regression/linear-regression.py')
+    training_df = scale_rows(script.load_dataset(TAXI_CSV), scale).copy()
+    training_df['TRIP_MINUTES'] = training_df['TRIP_SECONDS'] / 60
+    features = ['TRIP_MILES', 'TRIP_MINUTES']
+    label = 'FARE'
+    feature_values = training_df.loc[:, features].values
+    label_values = training_df[label].values
+    model = regression.build_model(0.001, len(features))
+    sampler = sampling.BatchSampler(training_df, seed=0)
+    raw_timestamps = scale_rows(pd.read_csv(TAXI_CSV, usecols=['TRIP_START_TIMESTAMP']), scale)['TRIP_START_TIMESTAMP']
+    fare_cube = script.build_cube(training_df)
+
+    def one_epoch(model):
+        regression.train_model(model, training_df, feature_values, label_values, 1, 50)
+
+    warm_up_size = warm_up_rows(len(training_df), 50)
+
+    def warm_up_fit(model):
+        regression.train_model(model, training_df, feature_values[:warm_up_size], label_values[:warm_up_size], 1, 50)
+
+    return [
+        Benchmark('taxi_corr', lambda: training_df, lambda df: df.corr(numeric_only=True), len(training_df)),
+        Benchmark('taxi_column_profile', lambda: training_df, script.profile_dataset, len(training_df)),
+        Benchmark(
+            'taxi_parse_timestamps',
+            setup=lambda: raw_timestamps,
+            run=timestamps.parse_timestamps,
+            rows=len(raw_timestamps),
+        ),
+        Benchmark(
+            'taxi_build_cube',
+            setup=lambda: training_df,
+            run=script.build_cube,
+            rows=len(training_df),
+        ),
+        Benchmark(
+            'taxi_cube_query',
+            setup=lambda: fare_cube,
+            run=lambda cube: cube.summary('FARE', PAYMENT_TYPE='Cash', START_HOUR=8),
+            rows=None,
+        ),
+        Benchmark(
+            'taxi_scan_query',
+            setup=lambda: training_df,
+            run=lambda df: df.loc[(df['PAYMENT_TYPE'] == 'Cash') & (df['START_HOUR'] == 8), 'FARE'].agg(
+                ['count', 'sum', 'mean', 'std', 'min', 'max']),
+            rows=len(training_df),
+        ),
+        Benchmark(
+            'taxi_sample_batch',
+            setup=lambda: sampler,
+            run=lambda batch_sampler: batch_sampler.batch(50),
+            rows=50,
+        ),
+        Benchmark(
+            'taxi_predict_fare',
+            setup=lambda: training_df,
+            run=lambda df: regression.predict(model, df, features, label, sampler=sampler),
+            rows=50,
+        ),
+        Benchmark(
+            'taxi_train_epoch',
+            setup=lambda: warm_up(regression.build_model(0.001, len(features)), warm_up_fit),
+            run=one_epoch,
+            rows=len(training_df),
+        ),
+    ]
+
+
+def calorie_benchmarks(scale):
+    script = load_script('numerical-data-stats/numerical-data-bad-values.py')
+    training_df = scale_rows(script.load_dataset(), scale)
+    # The loop only reads the first 4 weeks x 7 days x 50 subjects, whatever
+    # the size of the frame, so that is the row count it is measured on.
+    return [
+        Benchmark(
+            'thursday_calorie_means',
+            setup=lambda: training_df,
+            run=script.thursday_calorie_means,
+            rows=4 * 7 * 50,
+        ),
+    ]
+
+
+def housing_benchmarks(scale):
+    script = load_script('numerical-data-stats/numerical-data-stats.py')
+    training_df = scale_rows(script.load_dataset(HOUSING_CSV), scale)
+    index = script.build_spatial_index(training_df, 5.0)
+    points = training_df[['longitude', 'latitude']].to_numpy()
+    bucketizer = script.fit_bucketizer(training_df, script.bucket_bins, script.bucket_crosses)
+    model_df = script.prepare_training_data(script.neighbourhood_features(training_df, index))
+    feature_values = model_df.loc[:, script.features].to_numpy(dtype='float32')
+    label_values = model_df[script.label_k].to_numpy(dtype='float32')
+    model = regression.build_model(script.learning_rate, len(script.features))
+    sampler = sampling.BatchSampler(model_df, seed=0)
+
+    def one_epoch(model):
+        regression.train_model(model, model_df, feature_values, label_values, 1, script.batch_size)
+
+    warm_up_size = warm_up_rows(len(model_df), script.batch_size)
+
+    def warm_up_fit(model):
+        regression.train_model(model, model_df, feature_values[:warm_up_size], label_values[:warm_up_size], 1,
+                               script.batch_size)
+
+    def scan_radius(df):
+        projected = index._project(df['longitude'], df['latitude'])
+        centre = index._project(-122.4, 37.8)[0]
+        return np.flatnonzero(np.hypot(*(projected - centre).T) <= 3)
+
+    return [
+        Benchmark(
+            'housing_build_index',
+            setup=lambda: training_df,
+            run=lambda df: script.build_spatial_index(df, 5.0),
+            rows=len(training_df),
+        ),
+        Benchmark('housing_scan_radius', lambda: training_df, scan_radius, len(training_df)),
+        Benchmark(
+            'housing_radius_query',
+            setup=lambda: index,
+            run=lambda grid: grid.radius(-122.4, 37.8, 3),
+            rows=None,
+        ),
+        Benchmark(
+            'housing_nearest_query',
+            setup=lambda: index,
+            run=lambda grid: grid.nearest(*points[0], 10),
+            rows=None,
+        ),
+        Benchmark(
+            'housing_fit_bin_edges',
+            setup=lambda: training_df,
+            run=lambda df: script.fit_bucketizer(df, script.bucket_bins, script.bucket_crosses),
+            rows=len(training_df),
+        ),
+        Benchmark(
+            'housing_bucketize',
+            setup=lambda: training_df,
+            run=bucketizer.transform,
+            rows=len(training_df),
+        ),
+        Benchmark(
+            'housing_cell_features',
+            setup=lambda: training_df,
+            run=lambda df: script.neighbourhood_features(df, index),
+            rows=len(training_df),
+        ),
+        Benchmark(
+            'housing_predict',
+            setup=lambda: model_df,
+            run=lambda df: regression.predict(model, df, script.features, script.label_k, sampler=sampler),
+            rows=50,
+        ),
+        Benchmark(
+            'housing_train_epoch',
+            setup=lambda: warm_up(regression.build_model(script.learning_rate, len(script.features)), warm_up_fit),
+            run=one_epoch,
+            rows=len(model_df),
+        ),
+    ]
+
+
+SUITES = {
+    'csv': csv_benchmarks,
+    'rice': rice_benchmarks,
+    'taxi': taxi_benchmarks,
+    'calories': calorie_benchmarks,
+    'housing': housing_benchmarks,
+}
+
+
+def time_benchmark(benchmark, repeat):
+    timings = []
+    for _ in range(repeat):
+        argument = benchmark.setup()
+        timer = timeit.Timer(lambda: benchmark.run(argument))
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings.append(timer.timeit(number=1))
+    return timings
+
+
+def run(scales, suites, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            for suite in suites:
+                if suite == 'csv':
+                    benchmarks = csv_benchmarks(scale, workdir)
+                else:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        benchmarks = SUITES[suite](scale)
+                for benchmark in benchmarks:
+                    timings = time_benchmark(benchmark, repeat)
+                    result = {
+                        'benchmark': benchmark.name,
+                        'scale': scale,
+                        'rows': benchmark.rows,
+                        'min_seconds': min(timings),
+                        'median_seconds': statistics.median(timings),
+                        'rows_per_second': benchmark.rows / min(timings) if benchmark.rows else None,
+                    }
+                    results.append(result)
+                    if benchmark.rows:
+                        throughput = '{:>14,.0f} rows/s'.format(result['rows_per_second'])
+                        rows = '{:>10} rows'.format(benchmark.rows)
+                    else:
+                        throughput = '{:>14,.1f} us/op'.format(result['min_seconds'] * 1e6)
+                        rows = '{:>10} rows'.format('-')
+                    print('{:<28} {:>4}x {}  min {:>9.4f}s  median {:>9.4f}s  {}'.format(
+                        result['benchmark'], scale, rows, result['min_seconds'],
+                        result['median_seconds'], throughput))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITES), default=list(SUITES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--csv-threads', type=int, help='threads the pyarrow CSV engines may use')
+    args = parser.parse_args(argv)
+    csv_reader.set_threads(args.csv_threads)
+
+    np.random.seed(0)
+    results = run(args.scales, args.only, args.repeat)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Training throughput per thread configuration on the bundled datasets.
+
+TensorFlow fixes its thread pools once per process, so every configuration
+runs the one-epoch training benchmarks of `bench_pipelines` in a fresh
+subprocess with `common.runtime.configure_threads` applied first:
+
+    python benchmarks/bench_threads.py
+    python benchmarks/bench_threads.py --intra 1 2 4 --inter 1 2 --blas 1
+    python benchmarks/bench_threads.py --cpus 0-3 --json threads.json
+
+A thread count of 0 leaves that setting at TensorFlow's default (one thread
+per core).
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+from common import runtime
+
+TRAINING_BENCHMARKS = {
+    'taxi': 'taxi_train_epoch',
+    'rice': 'rice_train_epoch',
+    'housing': 'housing_train_epoch',
+}
+
+
+def run_worker(setting, suites, repeat):
+    """Runs inside the subprocess: applies `setting`, then times training."""
+    runtime.configure_threads(**setting)
+    import bench_pipelines
+
+    results = []
+    for suite in suites:
+        with contextlib.redirect_stdout(io.StringIO()):
+            benchmarks = bench_pipelines.SUITES[suite](1)
+        for benchmark in benchmarks:
+            if benchmark.name != TRAINING_BENCHMARKS[suite]:
+                continue
+            timings = bench_pipelines.time_benchmark(benchmark, repeat)
+            results.append({
+                'benchmark': benchmark.name,
+                'rows': benchmark.rows,
+                'min_seconds': min(timings),
+                'median_seconds': statistics.median(timings),
+                'rows_per_second': benchmark.rows / min(timings),
+            })
+    return results
+
+
+def settings_grid(intra, inter, blas, cpus):
+    for intra_op, inter_op, blas_threads in itertools.product(intra, inter, blas):
+        setting = {
+            'intra_op': intra_op or None,
+            'inter_op': inter_op or None,
+            'blas': blas_threads or None,
+        }
+        if cpus:
+            setting['cpus'] = sorted(runtime.parse_cpu_list(cpus))
+        yield setting
+
+
+def run_setting(setting, suites, repeat):
+    command = [
+        sys.executable, __file__,
+        '--worker', json.dumps(setting),
+        '--only', *suites,
+        '--repeat', str(repeat),
+    ]
+    environment = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    completed = subprocess.run(command, capture_output=True, text=True, env=environment, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def describe(setting):
+    return 'intra={} inter={} blas={}'.format(
+        setting['intra_op'] or 'default', setting['inter_op'] or 'default', setting['blas'] or 'default')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--intra', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--inter', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--blas', type=int, nargs='+', default=[0])
+    parser.add_argument('--cpus', help="pin every configuration to these CPU ids, e.g. '0-3'")
+    parser.add_argument('--only', nargs='+', choices=sorted(TRAINING_BENCHMARKS), default=list(TRAINING_BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        setting = json.loads(args.worker)
+        if setting.get('cpus'):
+            setting['cpus'] = set(setting['cpus'])
+        print(json.dumps(run_worker(setting, args.only, args.repeat)))
+        return
+
+    print('{} CPUs available'.format(len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()))
+    results = []
+    for setting in settings_grid(args.intra, args.inter, args.blas, args.cpus):
+        for result in run_setting(setting, args.only, args.repeat):
+            result.update(setting)
+            results.append(result)
+            print('{:<20} {:<38} min {:>8.4f}s  median {:>8.4f}s  {:>12,.0f} rows/s'.format(
+                result['benchmark'], describe(setting), result['min_seconds'],
+                result['median_seconds'], result['rows_per_second']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Quantile bucketization and feature crosses as integer codes.
+
+`Bucketizer.fit` computes the quantile bin edges of every column in one
+call, so they can be cached and reused; `transform` then turns each column
+into bucket codes with `np.searchsorted` and each cross of two bucketized
+columns into a single code, `a * buckets(b) + b`:
+
+    bucketizer = Bucketizer.fit(df, {'latitude': 10, 'longitude': 10},
+                                crosses=[('latitude', 'longitude')])
+    codes = bucketizer.transform(df)
+    codes['latitude_x_longitude']  # 0..99
+
+Buckets are closed on the left, as in Keras' `Discretization` layer, and
+values outside the fitted range fall into the first or last bucket.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def cross_name(first, second):
+    return '{}_x_{}'.format(first, second)
+
+
+class Bucketizer:
+    def __init__(self, edges, crosses=()):
+        self.edges = {column: np.asarray(column_edges) for column, column_edges in edges.items()}
+        self.crosses = [tuple(pair) for pair in crosses]
+        for first, second in self.crosses:
+            if first not in self.edges or second not in self.edges:
+                raise KeyError('Cannot cross {} and {}: both must be bucketized'.format(first, second))
+
+    @classmethod
+    def fit(cls, df, bins, crosses=()):
+        """Quantile edges for `bins` ({column: number of buckets})."""
+        columns = list(bins)
+        values = df[columns].to_numpy(dtype=np.float64)
+        # One quantile call over the union of all levels, then each column
+        # keeps its own; repeated edges (heavily tied values) are merged.
+        levels = sorted({q for n in bins.values() for q in np.linspace(0, 1, n + 1)[1:-1]})
+        quantiles = np.nanquantile(values, levels, axis=0) if levels else np.empty((0, len(columns)))
+        position = {level: i for i, level in enumerate(levels)}
+        edges = {}
+        for i, column in enumerate(columns):
+            rows = [position[q] for q in np.linspace(0, 1, bins[column] + 1)[1:-1]]
+            edges[column] = np.unique(quantiles[rows, i])
+        return cls(edges, crosses)
+
+    def buckets(self, column):
+        """Number of codes of a bucketized column or a cross."""
+        if column in self.edges:
+            return len(self.edges[column]) + 1
+        for first, second in self.crosses:
+            if column == cross_name(first, second):
+                return self.buckets(first) * self.buckets(second)
+        raise KeyError(column)
+
+    def transform(self, df):
+        """DataFrame of `<column>_bucket` and `<a>_x_<b>` integer codes."""
+        codes = {}
+        for column, column_edges in self.edges.items():
+            codes[column] = np.searchsorted(column_edges, df[column].to_numpy(), side='right').astype(np.int32)
+        result = {column + '_bucket': column_codes for column, column_codes in codes.items()}
+        for first, second in self.crosses:
+            result[cross_name(first, second)] = codes[first] * self.buckets(second) + codes[second]
+        return pd.DataFrame(result, index=df.index)
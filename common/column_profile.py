@@ -0,0 +1,96 @@
+"""Per-column profiles computed in one pass over each column.
+
+`profile` answers the usual first questions about a frame (missing values,
+dtypes, cardinality, ranges, most frequent values) from a single
+`value_counts` of every column instead of a separate scan per question.
+The null count, number of distinct values and top-k come straight from
+the counts; min, max and mean are computed over the distinct values,
+weighted by their counts. Columns are profiled concurrently on a thread
+pool:
+
+    columns = profile(df)
+    columns['nulls'].sum()                # any missing data?
+    columns.loc['PAYMENT_TYPE', 'top']    # [(value, count), ...]
+
+`python -m common.column_profile` prints the profile of every bundled
+dataset, or of the CSVs given on the command line.
+"""
+
+import argparse
+import concurrent.futures
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common import csv_reader
+from common import synthetic
+
+COLUMNS = ['dtype', 'rows', 'nulls', 'unique', 'min', 'max', 'mean', 'top']
+
+
+def profile_column(values, top_k=5):
+    counts = values.value_counts(dropna=False, sort=False)
+    missing = counts.index.isna()
+    nulls = int(counts[missing].sum())
+    counts = counts[~missing]
+    result = {
+        'dtype': str(values.dtype),
+        'rows': len(values),
+        'nulls': nulls,
+        'unique': len(counts),
+        'min': np.nan,
+        'max': np.nan,
+        'mean': np.nan,
+        'top': list(counts.nlargest(top_k).items()),
+    }
+    if len(counts) and (pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_datetime64_any_dtype(values.dtype)):
+        distinct = counts.index
+        result['min'] = distinct.min()
+        result['max'] = distinct.max()
+        if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+            weights = counts.to_numpy()
+            result['mean'] = float(np.dot(distinct.to_numpy(dtype=np.float64), weights) / weights.sum())
+    return result
+
+
+def profile(df, top_k=5, max_workers=None):
+    """DataFrame with one row per column of `df` and the COLUMNS statistics."""
+    max_workers = max_workers or min(len(df.columns), os.cpu_count() or 1) or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        profiles = list(executor.map(lambda column: profile_column(df[column], top_k), df.columns))
+    return pd.DataFrame(profiles, index=pd.Index(df.columns, name='column'), columns=COLUMNS)
+
+
+def format_profile(columns, top_k=3):
+    """The profile as a compact table, one line per column."""
+    def top(pairs):
+        return ', '.join('{} ({})'.format('{:.4g}'.format(value) if isinstance(value, float) else value, count)
+                         for value, count in pairs[:top_k])
+
+    compact = columns.drop(columns=['top']).assign(top=columns['top'].map(top))
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None,
+                           'display.width', 200, 'display.max_colwidth', 60,
+                           'display.float_format', '{:.4g}'.format):
+        return compact.to_string()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print a one-pass profile of the columns of CSV files.')
+    parser.add_argument('paths', nargs='*', help='CSV files (default: every bundled dataset)')
+    parser.add_argument('--top', type=int, default=3, help='most frequent values shown per column')
+    parser.add_argument('--workers', type=int, help='columns profiled concurrently')
+    csv_reader.add_csv_arguments(parser)
+    args = parser.parse_args(argv)
+    csv_reader.configure_from_args(args)
+
+    for path in args.paths or [str(path) for path in synthetic.DATASETS.values()]:
+        columns = profile(csv_reader.read_csv(path, engine=args.csv_engine), args.top, args.workers)
+        print('{} ({:,} rows, {} columns, {:,} missing values)'.format(
+            Path(path).name, columns['rows'].iloc[0], len(columns), columns['nulls'].sum()))
+        print(format_profile(columns, args.top), '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""CSV loading with a choice of parsing engine.
+
+Every loader takes an `engine`:
+
+- 'c': pandas' default C parser, single-threaded;
+- 'pyarrow': pyarrow's reader, which splits the file into blocks and
+  parses them on a thread pool, then converts to NumPy-backed columns;
+- 'arrow': the same reader, but the columns stay Arrow-backed, which
+  skips the conversion copy.
+
+    df = read_csv('chicago_taxi_train.csv', engine='pyarrow')
+
+`set_threads` caps the size of pyarrow's pool, for example to stay within
+the CPUs a process was pinned to. The pyarrow engines need the optional
+`pyarrow` package. Options of `pd.read_csv` that the pyarrow reader does
+not support (such as `chunksize`) only work with the 'c' engine.
+"""
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # only the 'c' engine is available
+    pyarrow = None
+
+ENGINES = ['c', 'pyarrow', 'arrow']
+
+
+def available_engines():
+    return ENGINES if pyarrow is not None else ['c']
+
+
+def set_threads(threads):
+    """Threads the pyarrow engines parse with; None keeps pyarrow's default."""
+    if threads is not None and pyarrow is not None:
+        pyarrow.set_cpu_count(threads)
+
+
+def read_csv(path, engine='c', **kwargs):
+    """`pd.read_csv` with the given engine."""
+    if engine not in ENGINES:
+        raise ValueError('Unknown CSV engine {}; expected one of {}'.format(engine, ', '.join(ENGINES)))
+    if engine == 'c':
+        return pd.read_csv(path, **kwargs)
+    if pyarrow is None:
+        raise ImportError("The '{}' CSV engine needs pyarrow (pip install pyarrow)".format(engine))
+    if engine == 'arrow':
+        kwargs['dtype_backend'] = 'pyarrow'
+    return pd.read_csv(path, engine='pyarrow', **kwargs)
+
+
+def add_csv_arguments(parser):
+    group = parser.add_argument_group('CSV parsing')
+    group.add_argument('--csv-engine', choices=ENGINES, default='c',
+                       help="'pyarrow' and 'arrow' parse blocks of the file on several threads")
+    group.add_argument('--csv-threads', type=int, help='threads the pyarrow engines may use')
+
+
+def configure_from_args(args):
+    set_threads(args.csv_threads)
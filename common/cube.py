@@ -0,0 +1,104 @@
+"""Pre-aggregated group-by cube for answering slice queries without a scan.
+
+`AggregateCube.build` groups a frame once by a few low-cardinality
+dimensions and keeps, per cell and measure, the count, sum, sum of squares,
+minimum and maximum. Any slice (some dimensions fixed, the others summed
+over) is then answered by combining the matching cells, a few thousand at
+most, instead of rescanning every row:
+
+    cube = AggregateCube.build(df, ['COMPANY', 'PAYMENT_TYPE'], ['FARE'])
+    cube.summary('FARE', PAYMENT_TYPE='Cash')['mean']
+    cube.counts('PAYMENT_TYPE').idxmax()
+
+Rows with a missing dimension value form their own cells, which `None`,
+`np.nan` or `pd.NA` all select.
+"""
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ['count', 'sum', 'sumsq', 'min', 'max']
+
+# NaN never equals itself, so missing values are looked up under one key.
+_MISSING = object()
+
+
+def _key(value):
+    return _MISSING if pd.isna(value) else value
+
+
+class AggregateCube:
+    def __init__(self, dimensions, measures, cells):
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        self.cells = cells
+        self._rows = cells['rows'].to_numpy()
+        # Dimension values are matched as integer codes and the statistics
+        # kept as plain arrays, so a query never compares strings or goes
+        # through DataFrame indexing.
+        self._values = {}
+        self._codes = {}
+        self._lookup = {}
+        for dimension in self.dimensions:
+            codes, values = pd.factorize(cells[dimension], use_na_sentinel=False)
+            self._codes[dimension] = codes
+            self._values[dimension] = np.asarray(values)
+            self._lookup[dimension] = {_key(value): code for code, value in enumerate(values)}
+        self._statistics = {
+            (measure, statistic): cells[measure + '_' + statistic].to_numpy()
+            for measure in self.measures for statistic in STATISTICS
+        }
+
+    @classmethod
+    def build(cls, df, dimensions, measures):
+        keys = [df[dimension] for dimension in dimensions]
+        grouped = df.groupby(keys, dropna=False, observed=True, sort=True)
+        columns = {'rows': grouped.size()}
+        for measure in measures:
+            values = grouped[measure]
+            columns[measure + '_count'] = values.count()
+            columns[measure + '_sum'] = values.sum()
+            columns[measure + '_sumsq'] = (df[measure] ** 2).groupby(keys, dropna=False, observed=True, sort=True).sum()
+            columns[measure + '_min'] = values.min()
+            columns[measure + '_max'] = values.max()
+        cells = pd.DataFrame(columns).reset_index()
+        return cls(dimensions, measures, cells)
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, value in filters.items():
+            if dimension not in self._lookup:
+                raise KeyError('{} is not a dimension of the cube'.format(dimension))
+            lookup = self._lookup[dimension]
+            if isinstance(value, (list, tuple, set)):
+                mask &= np.isin(self._codes[dimension], [lookup.get(_key(item), -1) for item in value])
+            else:
+                mask &= self._codes[dimension] == lookup.get(_key(value), -1)
+        return mask
+
+    def summary(self, measure, **filters):
+        """Count, sum, mean, std, min and max of `measure` over the slice."""
+        if measure not in self.measures:
+            raise KeyError('{} is not a measure of the cube'.format(measure))
+        mask = self._mask(filters)
+        cells = {statistic: self._statistics[measure, statistic][mask] for statistic in STATISTICS}
+        count = cells['count'].sum()
+        total = cells['sum'].sum()
+        result = {'count': int(count), 'sum': float(total), 'mean': np.nan, 'std': np.nan,
+                  'min': np.nan, 'max': np.nan}
+        if count:
+            result['mean'] = float(total / count)
+            result['min'] = float(np.nanmin(cells['min']))
+            result['max'] = float(np.nanmax(cells['max']))
+        if count > 1:
+            variance = (cells['sumsq'].sum() - total * total / count) / (count - 1)
+            result['std'] = float(np.sqrt(max(variance, 0.0)))
+        return result
+
+    def counts(self, dimension, **filters):
+        """Number of rows per value of `dimension` within the slice."""
+        mask = self._mask(filters)
+        totals = np.bincount(self._codes[dimension][mask], weights=self._rows[mask],
+                             minlength=len(self._values[dimension]))
+        counts = pd.Series(totals.astype(np.int64), index=self._values[dimension])
+        return counts[counts > 0]
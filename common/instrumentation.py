@@ -0,0 +1,148 @@
+"""Per-stage timing and memory spans, written out as a JSON profile per run.
+
+Usage from a script:
+
+    instrumentation.start('linear-regression')
+    with instrumentation.span('load_csv'):
+        df = pd.read_csv(...)
+    instrumentation.finish()
+
+When no profile has been started, `span` is a no-op, so library functions can
+be instrumented unconditionally and still be called from benchmarks.
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profile:
+    def __init__(self, run_name, trace_memory=False):
+        self.run_name = run_name
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self._started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @property
+    def _stack(self):
+        # Spans nest per thread, so stages running in parallel (see
+        # common.pipeline) each get their own parent chain.
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        stack = self._stack
+        frame = {'stage': stage, 'peak': 0}
+        if self.trace_memory:
+            # Fold the parent's peak so far into it before resetting, so
+            # nested spans do not hide the parent's own high-water mark.
+            # tracemalloc is process-wide, so peaks of concurrent spans
+            # include each other's allocations.
+            if stack:
+                parent = stack[-1]
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            frame['current'] = tracemalloc.get_traced_memory()[0]
+        stack.append(frame)
+
+        record = {
+            'stage': stage,
+            'parent': stack[-2]['stage'] if len(stack) > 1 else None,
+            'thread': threading.current_thread().name,
+        }
+        rss_before = peak_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            rss_after = peak_rss_bytes()
+            record['peak_rss_bytes'] = rss_after
+            record['peak_rss_delta_bytes'] = (
+                None if rss_after is None else rss_after - rss_before
+            )
+            stack.pop()
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['tracemalloc_peak_delta_bytes'] = peak - frame['current']
+                if stack:
+                    parent = stack[-1]
+                    parent['peak'] = max(parent['peak'], peak)
+            with self._lock:
+                self.spans.append(record)
+
+    def to_dict(self):
+        return {
+            'run': self.run_name,
+            'started_at': self._started_at,
+            'wall_seconds': time.perf_counter() - self._start_wall,
+            'cpu_seconds': time.process_time() - self._start_cpu,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'spans': self.spans,
+        }
+
+    def write(self, path=None):
+        path = path or '{}_profile.json'.format(self.run_name)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+_active = None
+
+
+def start(run_name, trace_memory=False):
+    global _active
+    _active = Profile(run_name, trace_memory=trace_memory)
+    return _active
+
+
+def span(stage):
+    if _active is None:
+        return contextlib.nullcontext({'stage': stage})
+    return _active.span(stage)
+
+
+def finish(path=None):
+    """Writes the active profile to `path` (default `<run>_profile.json`)."""
+    global _active
+    if _active is None:
+        return None
+    profile, _active = _active, None
+    written = profile.write(path)
+    profile.close()
+    print('Wrote profile to {}'.format(written))
+    return written
@@ -0,0 +1,122 @@
+"""Robust outlier filtering that can run over streamed chunks.
+
+`OutlierFilter` combines three kinds of rules, each a pair of fences per
+column:
+
+- `mad`: median +/- threshold * MAD (scaled to a normal sigma), for
+  columns whose spread would be inflated by the outliers themselves;
+- `iqr`: Tukey fences, the quartiles +/- k * IQR;
+- `bounds`: fixed physical limits, such as a plausible speed range.
+
+The medians, MADs and quartiles are fitted once, on the whole frame or on a
+sample of it, and every chunk is then checked against all the fences with a
+single vectorized comparison:
+
+    rules = OutlierFilter(mad=['FARE'], iqr=['TRIP_SECONDS'], bounds={'TRIP_SPEED': (1, 80)})
+    kept = rules.fit(training_df).apply(training_df)
+    print(rules.report())
+
+For data that does not fit in memory, fit on `sampling.reservoir_sample`
+of one pass and stream a second one through `filter_chunks`.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Scales the MAD of normally distributed data to its standard deviation.
+MAD_TO_SIGMA = 1.4826
+
+
+class OutlierFilter:
+    def __init__(self, mad=(), iqr=(), bounds=None, mad_threshold=3.5, iqr_k=1.5):
+        self.mad = list(mad)
+        self.iqr = list(iqr)
+        self.bounds = dict(bounds or {})
+        self.mad_threshold = mad_threshold
+        self.iqr_k = iqr_k
+        self.rules = (['mad:' + column for column in self.mad]
+                      + ['iqr:' + column for column in self.iqr]
+                      + ['bounds:' + column for column in self.bounds])
+        self._columns = self.mad + self.iqr + list(self.bounds)
+        self._low = None
+        self._high = None
+        self.reset()
+
+    def fit(self, df):
+        """Fits the MAD and IQR fences on `df`; returns the filter."""
+        low, high = [], []
+        if self.mad:
+            values = df[self.mad].to_numpy(dtype=np.float64)
+            median = np.nanmedian(values, axis=0)
+            deviation = np.nanmedian(np.abs(values - median), axis=0) * MAD_TO_SIGMA
+            low.append(median - self.mad_threshold * deviation)
+            high.append(median + self.mad_threshold * deviation)
+        if self.iqr:
+            values = df[self.iqr].to_numpy(dtype=np.float64)
+            first, third = np.nanquantile(values, [0.25, 0.75], axis=0)
+            spread = third - first
+            low.append(first - self.iqr_k * spread)
+            high.append(third + self.iqr_k * spread)
+        if self.bounds:
+            low.append(np.array([bound[0] for bound in self.bounds.values()], dtype=np.float64))
+            high.append(np.array([bound[1] for bound in self.bounds.values()], dtype=np.float64))
+        self._low = np.concatenate(low) if low else np.empty(0)
+        self._high = np.concatenate(high) if high else np.empty(0)
+        return self
+
+    def fences(self):
+        """DataFrame of the fitted low and high fence of every rule."""
+        self._check_fitted()
+        return pd.DataFrame({'low': self._low, 'high': self._high}, index=self.rules)
+
+    def violations(self, df):
+        """Boolean array, one row per row of `df` and one column per rule.
+
+        Missing values violate no rule; they are left to the caller.
+        """
+        self._check_fitted()
+        values = df[self._columns].to_numpy(dtype=np.float64)
+        return (values < self._low) | (values > self._high)
+
+    def apply(self, df):
+        """The rows of `df` that pass every rule; counts go to the report."""
+        violations = self.violations(df)
+        dropped = violations.any(axis=1)
+        self._rows += len(df)
+        self._dropped += int(dropped.sum())
+        self._per_rule += violations.sum(axis=0)
+        # Rows caught only by this rule: what relaxing it would bring back.
+        self._only += violations[violations.sum(axis=1) == 1].sum(axis=0)
+        return df[~dropped]
+
+    def filter_chunks(self, chunks):
+        """Yields the kept rows of every chunk of an iterable of DataFrames."""
+        for chunk in chunks:
+            yield self.apply(chunk)
+
+    def reset(self):
+        """Clears the counts collected by `apply`."""
+        self._rows = 0
+        self._dropped = 0
+        self._per_rule = np.zeros(len(self.rules), dtype=np.int64)
+        self._only = np.zeros(len(self.rules), dtype=np.int64)
+
+    def report(self):
+        """Rows dropped per rule (and only by that rule) since the last reset."""
+        report = pd.DataFrame({
+            'dropped': self._per_rule,
+            'only_rule': self._only,
+        }, index=pd.Index(self.rules, name='rule'))
+        if self._low is not None:
+            report.insert(0, 'high', self._high)
+            report.insert(0, 'low', self._low)
+        report['percent'] = 100 * report['dropped'] / max(self._rows, 1)
+        return report
+
+    def summary(self):
+        return 'Dropped {:,} of {:,} rows ({:.2f}%)'.format(
+            self._dropped, self._rows, 100 * self._dropped / max(self._rows, 1))
+
+    def _check_fitted(self):
+        if self._low is None:
+            raise RuntimeError('OutlierFilter must be fitted before it is applied')
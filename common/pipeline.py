@@ -0,0 +1,224 @@
+"""A small task graph that caches intermediate results between runs.
+
+Each task declares the upstream tasks it consumes, the parameters and input
+files it depends on and the files it writes. A task's fingerprint hashes its
+code, parameters, input file contents and the fingerprints of its upstream
+tasks, so a task is skipped whenever its fingerprint matches a cached result
+and its output files still exist. The code is the source of the module that
+defines the task and of the whole `common` package, so editing a global or
+a helper the task calls also invalidates its results; values a task reads
+from module scope are still best passed as `params`, so they show up in
+the cache key explicitly. Cached results of skipped tasks are only
+loaded when a task that actually runs needs them.
+
+Tasks whose inputs are ready run concurrently on a thread pool, so
+independent branches (for example plotting and training) overlap:
+
+    pipeline = Pipeline('.pipeline_cache')
+    pipeline.add('load', load_dataset, files=[csv_path])
+    pipeline.add('plots', save_plots, inputs=['load'], outputs=['plot.png'])
+    pipeline.add('train', train, inputs=['load'], params={'epochs': 20})
+    results = pipeline.run(['plots', 'train'])
+
+Results are pickled by default; pass `save`/`load` for values that do not
+pickle well, such as Keras models.
+"""
+
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import threading
+from pathlib import Path
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source(func):
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return getattr(func, '__qualname__', repr(func))
+
+
+def _module_source(func):
+    try:
+        return inspect.getsource(inspect.getmodule(func))
+    except (OSError, TypeError):
+        return ''
+
+
+_package_digest = None
+
+
+def package_digest():
+    """Digest of every module of the `common` package, computed once per process."""
+    global _package_digest
+    if _package_digest is None:
+        digest = hashlib.sha256()
+        for path in sorted(Path(__file__).resolve().parent.glob('*.py')):
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        _package_digest = digest.hexdigest()
+    return _package_digest
+
+
+def _pickle_save(result, path):
+    with open(str(path) + '.pkl', 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _pickle_load(path):
+    with open(str(path) + '.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+class Task:
+    def __init__(self, name, func, inputs=(), params=None, files=(), outputs=(),
+                 cache=True, save=None, load=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.files = [str(path) for path in files]
+        self.outputs = [str(path) for path in outputs]
+        # Tasks that only print or show something should not be cached,
+        # otherwise a cache hit would silently skip the output.
+        self.cache = cache
+        self.save = save or _pickle_save
+        self.load = load or _pickle_load
+
+
+class Pipeline:
+    def __init__(self, cache_dir='.pipeline_cache', max_workers=4):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.tasks = {}
+
+    def add(self, name, func, **kwargs):
+        if name in self.tasks:
+            raise ValueError('Duplicate task {}'.format(name))
+        for upstream in kwargs.get('inputs', ()):
+            if upstream not in self.tasks:
+                raise ValueError('Task {} depends on unknown task {}'.format(name, upstream))
+        self.tasks[name] = Task(name, func, **kwargs)
+        return self.tasks[name]
+
+    def _required(self, targets):
+        """The targets plus all of their ancestors, in insertion (topological) order."""
+        required = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.tasks:
+                raise KeyError('Unknown task {}'.format(name))
+            if name not in required:
+                required.add(name)
+                stack.extend(self.tasks[name].inputs)
+        return [name for name in self.tasks if name in required]
+
+    def fingerprint(self, name, _memo=None):
+        memo = {} if _memo is None else _memo
+        if name not in memo:
+            task = self.tasks[name]
+            payload = {
+                'name': task.name,
+                'code': _source(task.func),
+                'module': hashlib.sha256(_module_source(task.func).encode()).hexdigest(),
+                'package': package_digest(),
+                'params': task.params,
+                'files': {path: file_digest(path) for path in task.files if os.path.exists(path)},
+                'inputs': [self.fingerprint(upstream, memo) for upstream in task.inputs],
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=repr).encode()
+            memo[name] = hashlib.sha256(encoded).hexdigest()[:16]
+        return memo[name]
+
+    def _entry(self, task, fingerprint):
+        return self.cache_dir / task.name / fingerprint
+
+    def _is_cached(self, task, fingerprint):
+        if not task.cache:
+            return False
+        marker = Path(str(self._entry(task, fingerprint)) + '.done')
+        return marker.exists() and all(os.path.exists(path) for path in task.outputs)
+
+    def _store(self, task, fingerprint, result):
+        task_dir = self.cache_dir / task.name
+        # Only the latest fingerprint of each task is kept.
+        if task_dir.exists():
+            shutil.rmtree(task_dir)
+        task_dir.mkdir(parents=True)
+        entry = self._entry(task, fingerprint)
+        task.save(result, entry)
+        Path(str(entry) + '.done').touch()
+
+    def run(self, targets=None, force=False):
+        """Runs `targets` (default: every task) and returns the results of
+        those that ran or had to be loaded for a downstream task.
+
+        `force` re-runs every required task, or only the named tasks if it
+        is a collection of task names.
+        """
+        targets = list(targets or self.tasks)
+        order = self._required(targets)
+        memo = {}
+        fingerprints = {name: self.fingerprint(name, memo) for name in order}
+        forced = set(order) if force is True else set(force or ())
+
+        skipped = set()
+        for name in order:
+            task = self.tasks[name]
+            upstream_ran = any(upstream not in skipped for upstream in task.inputs)
+            if name not in forced and not upstream_ran and self._is_cached(task, fingerprints[name]):
+                skipped.add(name)
+
+        results = {}
+        load_lock = threading.Lock()
+
+        def result_of(name):
+            with load_lock:
+                if name not in results:
+                    task = self.tasks[name]
+                    results[name] = task.load(self._entry(task, fingerprints[name]))
+                return results[name]
+
+        def execute(name):
+            task = self.tasks[name]
+            arguments = [result_of(upstream) for upstream in task.inputs]
+            result = task.func(*arguments, **task.params)
+            if task.cache:
+                self._store(task, fingerprints[name], result)
+            with load_lock:
+                results[name] = result
+
+        for name in order:
+            if name in skipped:
+                print('[pipeline] {}: up to date'.format(name))
+
+        done = set(skipped)
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            while len(done) < len(order):
+                for name in order:
+                    ready = all(upstream in done for upstream in self.tasks[name].inputs)
+                    if name not in done and name not in running.values() and ready:
+                        print('[pipeline] {}: running'.format(name))
+                        running[executor.submit(execute, name)] = name
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    future.result()
+                    done.add(name)
+
+        return {name: results[name] for name in targets if name in results}
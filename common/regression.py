@@ -0,0 +1,293 @@
+"""Linear regression experiments on any numeric features of a DataFrame.
+
+`run_experiment` builds, trains and reports a single-layer Keras model for
+any label and any number of numeric features, optionally with a learned
+offset per category of some categorical columns:
+
+    model, model_output = run_experiment(df, ['TRIP_MILES', 'TRIP_MINUTES'], 'FARE',
+                                         learning_rate=0.001, epochs=20, batch_size=50)
+    show_predictions(predict(model, df, ['TRIP_MILES', 'TRIP_MINUTES'], 'FARE'))
+
+`model_output` is `(weights, bias, epochs, rmse)`; `make_plots` draws the
+loss curve next to the data and the fitted line or plane.
+"""
+
+import keras
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from common import instrumentation
+from common import runtime
+from common import sampling
+from common import training_log
+
+
+def make_plots(df, feature_names, label_name, model_output, sample_size=200, grid_resolution=20, sampler=None,
+               path='plot.png'):
+    sampler = sampler or sampling.BatchSampler(df)
+    random_sample = sampler.batch(sample_size)
+    weights, bias, epochs, rmse = model_output
+
+    is_2d_plot = len(feature_names) == 1
+    model_plot_type = "scatter" if is_2d_plot else "surface"
+    fig = make_subplots(rows=1, cols=2,
+                        subplot_titles=("Loss Curve", "Model Plot"),
+                        specs=[[{"type": "scatter"}, {"type": model_plot_type}]])
+    plot_data(random_sample, feature_names, label_name, fig)
+    plot_model(random_sample, feature_names, weights, bias, fig, grid_resolution)
+    plot_loss_curve(epochs, rmse, fig)
+
+    fig.show()
+    with instrumentation.span('image_export'):
+        fig.write_image(path)
+    return
+
+
+def plot_loss_curve(epochs, rmse, fig):
+    curve = px.line(x=epochs, y=rmse)
+    curve.update_traces(line_color='#ff0000', line_width=3)
+
+    fig.append_trace(curve.data[0], row=1, col=1)
+    fig.update_xaxes(title_text="Epochs", row=1, col=1)
+    fig.update_yaxes(title_text="Root Mean Squared Error", row=1, col=1, range=[rmse.min()*0.8, rmse.max()*1.2])
+    return
+
+
+def plot_data(df, features, label, fig):
+    if len(features) == 1:
+        scatter = px.scatter(df, x=features[0], y=label)
+    else:
+        scatter = px.scatter_3d(df, x=features[0], y=features[1], z=label)
+
+    fig.append_trace(scatter.data[0], row=1, col=2)
+    if len(features) == 1:
+        fig.update_xaxes(title_text=features[0], row=1, col=2)
+        fig.update_yaxes(title_text=label, row=1, col=2)
+    else:
+        fig.update_layout(scene1=dict(xaxis_title=features[0], yaxis_title=features[1], zaxis_title=label))
+    return
+
+
+def plot_model(df, features, weights, bias, fig, grid_resolution=20):
+    weights = np.asarray(weights).reshape(-1)
+
+    if len(features) == 1:
+        x = np.sort(df[features[0]].to_numpy(dtype=np.float64))
+        model = px.line(x=x, y=x * weights[0] + bias[0])
+        model.update_traces(line_color='#ff0000', line_width=3)
+    else:
+        x_name, y_name = features[0], features[1]
+        x = np.linspace(df[x_name].min(), df[x_name].max(), grid_resolution)
+        y = np.linspace(df[y_name].min(), df[y_name].max(), grid_resolution)
+        # Features past the two plotted axes are held at their sample mean, so
+        # the surface is the fitted plane sliced through those two axes.
+        offset = bias[0] + df.loc[:, features[2:]].mean().to_numpy(dtype=np.float64) @ weights[2:]
+        z = offset + weights[0] * x[np.newaxis, :] + weights[1] * y[:, np.newaxis]
+
+        light_yellow = [[0, '#89CFF0'], [1, '#FFDB58']]
+        model = go.Figure(data=go.Surface(z=z, y=y, x=x, colorscale=light_yellow))
+
+    fig.add_trace(model.data[0], row=1, col=2)
+    return
+
+
+def model_info(feature_names, label_name, model_output):
+    weights = model_output[0]
+    bias = model_output[1]
+
+    nl = "\n"
+    header = "-" * 80
+    banner = header + nl + "|" + "MODEL INFO".center(78) + "|" + nl + header
+
+    info = ""
+    equation = label_name + " = "
+
+    for index, feature in enumerate(feature_names):
+        info = info + "Weight for feature[{}]: {:.3f}\n".format(feature, weights[index][0])
+        equation = equation + "{:.3f} * {} + ".format(weights[index][0], feature)
+
+    info = info + "Bias: {:.3f}\n".format(bias[0])
+    equation =  equation + "{:.3f}\n".format(bias[0])
+
+    return banner + nl + info + nl + equation + nl
+
+
+def build_model(my_learning_rate, num_features, steps_per_execution=1, jit_compile='auto', category_counts=None):
+    with instrumentation.span('compile'):
+        # Inputs arrive in the compute dtype of the active dtype policy; the
+        # output stays float32 so the loss is not computed in bfloat16.
+        inputs = keras.Input(shape=(num_features,), dtype=keras.config.dtype_policy().compute_dtype, name='numeric')
+        outputs = keras.layers.Dense(units=1, dtype='float32', name='linear')(inputs)
+
+        # Every category adds its own learned offset to the label. A width-1
+        # embedding of the integer codes is a one-hot encoding times a weight
+        # vector, without ever building the rows x categories one-hot matrix.
+        # The offsets start at zero: the last code, for values outside the
+        # vocabulary, never occurs in training and must not keep a random one.
+        model_inputs = [inputs]
+        for column, count in (category_counts or {}).items():
+            codes = keras.Input(shape=(1,), dtype='int32', name=column)
+            offset = keras.layers.Embedding(count, 1, embeddings_initializer='zeros', dtype='float32',
+                                            name=column + '_offset')(codes)
+            outputs = keras.layers.Add()([outputs, keras.layers.Flatten()(offset)])
+            model_inputs.append(codes)
+        model = keras.Model(inputs=model_inputs if category_counts else inputs, outputs=outputs)
+
+        model.compile(optimizer=keras.optimizers.RMSprop(learning_rate=my_learning_rate),
+                      loss="mean_squared_error",
+                      metrics=[keras.metrics.RootMeanSquaredError()],
+                      steps_per_execution=steps_per_execution,
+                      jit_compile=jit_compile)
+    return model
+
+
+def train_model(model, df, features, label, epochs, batch_size, metrics_log=None, callbacks=None):
+    # With a metrics log the loss curve is streamed to disk while training and
+    # read back from there, instead of from the in-memory history.
+    callbacks = list(callbacks or [])
+    if metrics_log:
+        callbacks.append(training_log.MetricsLog(metrics_log))
+    with instrumentation.span('fit'):
+        history = model.fit(x=features,
+                            y=label,
+                            batch_size=batch_size,
+                            epochs=epochs,
+                            callbacks=callbacks)
+
+    trained_weight, trained_bias = model.get_layer('linear').get_weights()
+
+    if metrics_log:
+        hist = training_log.read_log(metrics_log)
+        epochs = hist['epoch'].tolist()
+    else:
+        epochs = history.epoch
+        hist = pd.DataFrame(history.history)
+
+    rmse = hist["root_mean_squared_error"]
+
+    return trained_weight, trained_bias, epochs, rmse
+
+
+def build_vocabularies(df, columns):
+    return {column: sorted(df[column].dropna().unique()) for column in columns}
+
+
+def encode_categories(df, vocabularies):
+    """Integer codes per column; values missing from the vocabulary share its last code."""
+    codes = {}
+    for column, vocabulary in vocabularies.items():
+        column_codes = pd.Categorical(df[column], categories=vocabulary).codes
+        codes[column] = np.where(column_codes < 0, len(vocabulary), column_codes).astype(np.int32)
+    return codes
+
+
+def model_inputs(df, feature_names, vocabularies=None, dtype=None):
+    numeric = df.loc[:, feature_names].to_numpy(dtype=dtype)
+    if not vocabularies:
+        return numeric
+    return {'numeric': numeric, **encode_categories(df, vocabularies)}
+
+
+def category_offsets(model, vocabularies):
+    return {
+        column: pd.Series(model.get_layer(column + '_offset').get_weights()[0][:, 0],
+                          index=list(vocabulary) + ['<other>'])
+        for column, vocabulary in vocabularies.items()
+    }
+
+
+def category_info(offsets, top=3):
+    info = ''
+    for column, column_offsets in offsets.items():
+        ranked = column_offsets.sort_values(ascending=False)
+        info += 'Largest {} offsets: {}\n'.format(column, ', '.join(
+            '{} {:+.3f}'.format(name, value) for name, value in ranked.head(top).items()))
+        info += 'Smallest {} offsets: {}\n'.format(column, ', '.join(
+            '{} {:+.3f}'.format(name, value) for name, value in ranked.tail(top).items()))
+    return info
+
+
+def run_experiment(df, feature_names, label_name, learning_rate, epochs, batch_size, plot=True, metrics_log=None,
+                   dtype_policy='float32', large_batch_size=None, vocabularies=None, plot_path='plot.png'):
+    print('INFO: starting training experiment with features={} and label={}\n'.format(feature_names, label_name))
+
+    steps_per_execution, jit_compile, callbacks = 1, 'auto', []
+    if large_batch_size:
+        learning_rate, batch_size, steps_per_execution = runtime.large_batch_settings(
+            learning_rate, batch_size, large_batch_size, len(df))
+        jit_compile = True
+        callbacks.append(runtime.large_batch_schedule(learning_rate, epochs))
+        print('INFO: large-batch mode with batch_size={}, learning_rate={:.4f}, steps_per_execution={}\n'.format(
+            batch_size, learning_rate, steps_per_execution))
+
+    num_features = len(feature_names)
+
+    features = model_inputs(df, feature_names, vocabularies, runtime.input_dtype(dtype_policy))
+    label = df[label_name].to_numpy(dtype=runtime.label_dtype(dtype_policy))
+
+    category_counts = {column: len(vocabulary) + 1 for column, vocabulary in (vocabularies or {}).items()}
+    model = build_model(learning_rate, num_features, steps_per_execution, jit_compile, category_counts)
+    model_output = train_model(model, df, features, label, epochs, batch_size, metrics_log, callbacks)
+
+    print('\nSUCCESS: training experiment complete\n')
+    print('{}'.format(model_info(feature_names, label_name, model_output)))
+    if vocabularies:
+        offsets = category_offsets(model, vocabularies)
+        print(category_info(offsets))
+        # The plots and the equation only show the numeric features, so the
+        # average category offset of the training rows is folded into the bias.
+        weights, bias, epochs_run, rmse = model_output
+        mean_offset = sum(offsets[column].to_numpy()[features[column]].mean() for column in vocabularies)
+        model_output = (weights, bias + mean_offset, epochs_run, rmse)
+    if plot:
+        with instrumentation.span('plots'):
+            make_plots(df, feature_names, label_name, model_output, path=plot_path)
+
+    return model, model_output
+
+
+def save_trained_model(trained, path):
+    model, model_output = trained
+    model.save(str(path) + '.keras')
+    pd.to_pickle(model_output, str(path) + '_output.pkl')
+
+
+def load_trained_model(path):
+    return keras.models.load_model(str(path) + '.keras'), pd.read_pickle(str(path) + '_output.pkl')
+
+
+def format_currency(x):
+    return "${:.2f}".format(x)
+
+
+def predict(model, df, features, label, batch_size=50, sampler=None, vocabularies=None, formatter=format_currency):
+    """Predictions, observations and L1 loss for one random batch of `df`."""
+    # Pass the same sampler to repeated calls so the rows are shuffled once
+    # per pass over the frame rather than on every batch.
+    sampler = sampler or sampling.BatchSampler(df)
+    batch = sampler.batch(batch_size)
+    with instrumentation.span('predict'):
+        # Arrow-backed frames (the 'arrow' CSV engine) would otherwise come
+        # out as object arrays, which Keras cannot convert.
+        inputs = model_inputs(batch, features, vocabularies, keras.config.dtype_policy().compute_dtype)
+        predicted = model.predict_on_batch(x=inputs)[:, 0]
+
+    observed = batch[label].to_numpy(dtype=np.float64)
+    output_df = pd.DataFrame({
+        'PREDICTED_' + label: predicted,
+        'OBSERVED_' + label: observed,
+        'L1_LOSS': np.abs(predicted - observed),
+    })
+    output_df = output_df.map(formatter)
+    return output_df.join(batch[features].round(2))
+
+
+def show_predictions(output):
+    header = "-" * 80
+    banner = header + "\n" + "|" + "PREDICTIONS".center(78) + "|" + "\n" + header
+    print(banner)
+    print(output)
+    return
@@ -0,0 +1,68 @@
+"""Random row batches without resampling the whole frame every time.
+
+`BatchSampler` shuffles the row positions of a frame once per pass and then
+hands out successive slices of that permutation, so each batch only costs
+gathering its own rows:
+
+    sampler = BatchSampler(training_df)
+    batch = sampler.batch(50)
+
+Batches within a pass never share rows. `reservoir_sample` draws a uniform
+sample from a stream of chunks (for example `pd.read_csv(..., chunksize=)`)
+without holding more than the sample and one chunk in memory.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class BatchSampler:
+    def __init__(self, df, seed=None):
+        self.df = df
+        self.epoch = 0
+        self._rng = np.random.default_rng(seed)
+        self._order = np.empty(0, dtype=np.intp)
+        self._next = 0
+
+    def batch(self, size):
+        """The next `size` rows of the current pass, indexed 0..size-1."""
+        if size > len(self.df):
+            raise ValueError('Batch of {} rows requested from {} rows'.format(size, len(self.df)))
+        if self._next + size > len(self._order):
+            # Rows left over from the previous pass are dropped rather than
+            # mixed into the new one, so a batch never repeats a row.
+            self._order = self._rng.permutation(len(self.df))
+            self._next = 0
+            self.epoch += 1
+        positions = self._order[self._next:self._next + size]
+        self._next += size
+        return self.df.iloc[positions].reset_index(drop=True)
+
+
+def reservoir_sample(chunks, size, seed=None):
+    """A uniform sample of `size` rows from an iterable of DataFrames."""
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    seen = 0
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        if reservoir is None:
+            reservoir = chunk.iloc[:0]
+        fill = min(size - len(reservoir), len(chunk))
+        if fill > 0:
+            reservoir = pd.concat([reservoir, chunk.iloc[:fill]], ignore_index=True)
+        rest = chunk.iloc[fill:]
+        if len(rest):
+            # Algorithm R, vectorized: row i of the stream replaces a random
+            # slot with probability size / (i + 1). When several rows of the
+            # chunk pick the same slot, the last one wins, as it would when
+            # processing them one by one.
+            stream_index = seen + fill + np.arange(len(rest))
+            slots = rng.integers(0, stream_index + 1)
+            accepted = np.flatnonzero(slots < size)
+            last_slots, last_positions = np.unique(slots[accepted][::-1], return_index=True)
+            rows = accepted[::-1][last_positions]
+            for column in range(reservoir.shape[1]):
+                reservoir.iloc[last_slots, column] = rest.iloc[rows, column].to_numpy()
+        seen += len(chunk)
+    return reservoir
@@ -0,0 +1,116 @@
+"""Uniform grid index over longitude/latitude points.
+
+`GridIndex` projects the points once onto a local plane in kilometres
+(equirectangular, around their mean latitude, which is accurate to well
+under 1% across a state-sized area), buckets them into square cells and
+stores the row ids sorted by cell, so the rows of any cell are one slice:
+
+    index = GridIndex(df['longitude'], df['latitude'], cell_km=5)
+    rows, distances = index.radius(-122.4, 37.8, 3)
+    rows, distances = index.nearest(-122.4, 37.8, 10)
+    cells = index.cell_aggregates(df['median_house_value'])
+
+A query only visits the cells its search circle overlaps, so it costs the
+number of nearby points rather than the size of the dataset.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+KM_PER_DEGREE = 111.195
+
+
+class GridIndex:
+    def __init__(self, longitude, latitude, cell_km=5.0):
+        longitude = np.asarray(longitude, dtype=np.float64)
+        latitude = np.asarray(latitude, dtype=np.float64)
+        self.cell_km = cell_km
+        self._x_scale = KM_PER_DEGREE * math.cos(math.radians(np.mean(latitude)))
+        self._origin = np.array([longitude.min(), latitude.min()])
+        self._points = self._project(longitude, latitude)
+
+        cells = np.floor(self._points / cell_km).astype(np.int64)
+        self.shape = tuple(cells.max(axis=0) + 1)
+        cell_ids = cells[:, 0] * self.shape[1] + cells[:, 1]
+        # CSR layout: rows of cell c are order[starts[c]:starts[c + 1]].
+        self._order = np.argsort(cell_ids, kind='stable')
+        counts = np.bincount(cell_ids, minlength=self.shape[0] * self.shape[1])
+        self._starts = np.concatenate([[0], np.cumsum(counts)])
+        self._sorted_points = self._points[self._order]
+
+    def __len__(self):
+        return len(self._points)
+
+    def _project(self, longitude, latitude):
+        return np.column_stack([
+            (np.asarray(longitude, dtype=np.float64) - self._origin[0]) * self._x_scale,
+            (np.asarray(latitude, dtype=np.float64) - self._origin[1]) * KM_PER_DEGREE,
+        ])
+
+    def _candidates(self, point, reach_km):
+        """Sorted-order positions of the points in cells within `reach_km`."""
+        low = np.maximum(np.floor((point - reach_km) / self.cell_km).astype(np.int64), 0)
+        high = np.minimum(np.floor((point + reach_km) / self.cell_km).astype(np.int64),
+                          np.array(self.shape) - 1)
+        if (high < low).any():
+            return np.empty(0, dtype=np.int64)
+        # Cells of one grid column are contiguous, so each column is one slice.
+        first = self._starts[np.arange(low[0], high[0] + 1) * self.shape[1] + low[1]]
+        last = self._starts[np.arange(low[0], high[0] + 1) * self.shape[1] + high[1] + 1]
+        return np.concatenate([np.arange(start, stop) for start, stop in zip(first, last)])
+
+    def radius(self, longitude, latitude, radius_km):
+        """Row ids and distances (km) of the points within `radius_km`, nearest first."""
+        point = self._project(longitude, latitude)[0]
+        positions = self._candidates(point, radius_km)
+        distances = np.hypot(*(self._sorted_points[positions] - point).T)
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        nearest_first = np.argsort(distances, kind='stable')
+        return self._order[positions[nearest_first]], distances[nearest_first]
+
+    def nearest(self, longitude, latitude, k):
+        """Row ids and distances (km) of the `k` nearest points."""
+        k = min(k, len(self))
+        if k <= 0:
+            return self._order[:0], np.empty(0)
+        point = self._project(longitude, latitude)[0]
+        reach = self.cell_km
+        while True:
+            positions = self._candidates(point, reach)
+            if len(positions) >= k:
+                distances = np.hypot(*(self._sorted_points[positions] - point).T)
+                nearest_k = np.argpartition(distances, k - 1)[:k]
+                # The k found are only certain once the search square also
+                # contains the circle through the farthest of them.
+                if distances[nearest_k].max() <= reach or len(positions) == len(self):
+                    nearest_k = nearest_k[np.argsort(distances[nearest_k], kind='stable')]
+                    return self._order[positions[nearest_k]], distances[nearest_k]
+            reach *= 2
+
+    def cell_of(self, longitude, latitude):
+        """Cell id of each point, in the numbering `cell_aggregates` uses."""
+        cells = np.floor(self._project(longitude, latitude) / self.cell_km).astype(np.int64)
+        cells = np.clip(cells, 0, np.array(self.shape) - 1)
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def cell_aggregates(self, values):
+        """Count, mean, min and max of `values` per non-empty cell."""
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.diff(self._starts)
+        occupied = np.flatnonzero(counts)
+        sorted_values = values[self._order]
+        starts = self._starts[occupied]
+        sums = np.add.reduceat(sorted_values, starts)
+        centres_x = (occupied // self.shape[1] + 0.5) * self.cell_km
+        centres_y = (occupied % self.shape[1] + 0.5) * self.cell_km
+        return pd.DataFrame({
+            'longitude': self._origin[0] + centres_x / self._x_scale,
+            'latitude': self._origin[1] + centres_y / KM_PER_DEGREE,
+            'count': counts[occupied],
+            'mean': sums / counts[occupied],
+            'min': np.minimum.reduceat(sorted_values, starts),
+            'max': np.maximum.reduceat(sorted_values, starts),
+        }, index=pd.Index(occupied, name='cell'))
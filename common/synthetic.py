@@ -0,0 +1,188 @@
+"""Synthetic versions of the bundled datasets for load testing.
+
+A `SyntheticModel` is fitted on one of the bundled CSVs with a Gaussian
+copula: every column keeps its own marginal distribution (quantiles for
+continuous columns, value frequencies for discrete ones, plus its null rate)
+and the rank correlations between columns are preserved through a shared
+multivariate normal. Rows are then generated in chunks, so arbitrarily large
+files can be streamed to disk with bounded memory:
+
+    python -m common.synthetic taxi --rows 10000000 --out taxi_10m.csv
+
+Output is deterministic for a given seed and chunk size, and has the same
+columns and column order as the source file. Every column reads back with
+the source's dtype; integer columns with missing values, which pandas
+reads as float, are still written as integers.
+"""
+
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from common import timestamps
+
+ROOT = Path(__file__).resolve().parents[1]
+
+DATASETS = {
+    'taxi': ROOT / 'linear-regression' / 'chicago_taxi_train.csv',
+    'rice': ROOT / 'binary-classification' / 'Rice_Cammeo_Osmancik.csv',
+    'housing': ROOT / 'numerical-data-stats' / 'california_housing_train.csv',
+}
+
+# Standard normal CDF tabulated once; np.interp over the table gives a
+# vectorized CDF and inverse CDF without depending on scipy.
+_Z_GRID = np.linspace(-8.5, 8.5, 8193)
+_CDF_GRID = np.array([0.5 * (1.0 + math.erf(z / math.sqrt(2.0))) for z in _Z_GRID])
+
+
+def normal_cdf(z):
+    return np.interp(z, _Z_GRID, _CDF_GRID)
+
+
+def normal_ppf(u):
+    return np.interp(u, _CDF_GRID, _Z_GRID)
+
+
+def _decimals(values, max_decimals=6):
+    """Smallest number of decimals that represents every value exactly, if any."""
+    for decimals in range(max_decimals + 1):
+        scaled = values * 10 ** decimals
+        if np.allclose(scaled, np.round(scaled), rtol=0, atol=1e-6):
+            return decimals
+    return None
+
+
+def _category_order(values):
+    """Orders discrete values so that neighbouring codes are similar values."""
+    if values.dtype.kind in 'biuf':
+        return np.sort(values)
+    parsed = timestamps.parse_timestamps(values)
+    if parsed.notna().all():
+        return values[np.argsort(parsed.to_numpy(), kind='stable')]
+    return np.sort(values.astype(str))
+
+
+class SyntheticModel:
+    def __init__(self, columns, correlation, row_count):
+        self.columns = columns
+        self.correlation = correlation
+        self.row_count = row_count
+        self._cholesky = np.linalg.cholesky(correlation)
+
+    @classmethod
+    def fit(cls, df, max_categories=256, quantiles=2049):
+        columns = []
+        latent = np.zeros((len(df), len(df.columns)))
+        for j, name in enumerate(df.columns):
+            series = df[name]
+            present = series.notna().to_numpy()
+            values = series.to_numpy()[present]
+            column = {'name': name, 'null_rate': 1.0 - present.mean()}
+
+            unique = pd.unique(values)
+            if len(unique) <= max_categories or values.dtype.kind not in 'biuf':
+                categories = _category_order(unique)
+                counts = pd.Series(values).value_counts().reindex(categories).to_numpy()
+                cumulative = np.cumsum(counts) / counts.sum()
+                codes = pd.Index(categories).get_indexer(values)
+                column.update(kind='discrete', categories=categories, cumulative=cumulative)
+                # Mid-point of each category's probability mass as its rank.
+                ranks = cumulative[codes] - counts[codes] / counts.sum() / 2
+            else:
+                levels = np.linspace(0.0, 1.0, min(quantiles, len(values)))
+                values = values.astype(np.float64)
+                column.update(
+                    kind='continuous',
+                    levels=levels,
+                    quantiles=np.quantile(values, levels),
+                    decimals=_decimals(values),
+                )
+                ranks = (pd.Series(values).rank(method='average').to_numpy() - 0.5) / len(values)
+            # pandas reads integer columns with missing values as float, so
+            # whole-valued float columns with nulls are written back as integers.
+            column['integer'] = series.dtype.kind in 'iu' or (
+                series.dtype.kind == 'f' and not present.all() and np.array_equal(values, np.round(values)))
+
+            latent_column = np.full(len(df), np.nan)
+            latent_column[present] = normal_ppf(ranks)
+            latent[:, j] = latent_column
+            columns.append(column)
+
+        correlation = pd.DataFrame(latent).corr().fillna(0.0).to_numpy()
+        return cls(columns, _nearest_correlation(correlation), len(df))
+
+    def sample(self, n_rows, rng):
+        z = rng.standard_normal((n_rows, len(self.columns))) @ self._cholesky.T
+        u = normal_cdf(z)
+        data = {}
+        for j, column in enumerate(self.columns):
+            if column['kind'] == 'discrete':
+                codes = np.searchsorted(column['cumulative'], u[:, j], side='right')
+                values = column['categories'][np.minimum(codes, len(column['categories']) - 1)]
+                if column['integer']:
+                    values = values.astype(np.int64)
+            else:
+                values = np.interp(u[:, j], column['levels'], column['quantiles'])
+                if column['integer']:
+                    values = np.round(values)
+                elif column['decimals'] is not None:
+                    values = np.round(values, column['decimals'])
+
+            if column['null_rate'] > 0:
+                missing = rng.random(n_rows) < column['null_rate']
+                values = pd.Series(values).where(~missing)
+                if column['integer']:
+                    values = values.astype('Int64')
+            elif column['integer']:
+                values = values.astype(np.int64)
+            data[column['name']] = values
+        return pd.DataFrame(data)
+
+    def iter_chunks(self, n_rows, chunk_size=100_000, seed=0):
+        """Yields DataFrames totalling `n_rows`, each from its own child seed."""
+        n_chunks = max(1, math.ceil(n_rows / chunk_size))
+        seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+        for index, child_seed in enumerate(seeds):
+            rows = min(chunk_size, n_rows - index * chunk_size)
+            if rows <= 0:
+                break
+            yield self.sample(rows, np.random.default_rng(child_seed))
+
+    def write_csv(self, path, n_rows, chunk_size=100_000, seed=0):
+        for index, chunk in enumerate(self.iter_chunks(n_rows, chunk_size, seed)):
+            chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        return path
+
+
+def _nearest_correlation(correlation, epsilon=1e-6):
+    """Clips negative eigenvalues so pairwise-estimated correlations stay PSD."""
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    eigenvalues = np.clip(eigenvalues, epsilon, None)
+    fixed = eigenvectors @ np.diag(eigenvalues) @ eigenvectors.T
+    scale = np.sqrt(np.diag(fixed))
+    return fixed / np.outer(scale, scale)
+
+
+def fit_dataset(name):
+    return SyntheticModel.fit(pd.read_csv(DATASETS[name]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic copy of a bundled dataset.')
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    model = fit_dataset(args.dataset)
+    model.write_csv(args.out, args.rows, args.chunk_size, args.seed)
+    print('Wrote {} synthetic {} rows to {}'.format(args.rows, args.dataset, args.out))
+
+
+if __name__ == '__main__':
+    main()
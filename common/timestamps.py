@@ -0,0 +1,96 @@
+"""Fast parsing of the taxi dataset's fixed-format timestamps.
+
+The Chicago taxi CSV writes every timestamp as `MM/DD/YYYY h:mm:ss AM`, with
+an hour of one or two digits. `parse_timestamps` never infers a format or
+calls strptime per row: it factorizes the column, so every distinct string
+is parsed once (trip times are rounded to 15 minutes, so there are a few
+hundred of them per million rows), and decodes those strings with integer
+arithmetic on their raw bytes. Values that do not match the layout are
+handed to `pd.to_datetime` with the explicit format, and missing values
+stay NaT.
+"""
+
+import numpy as np
+import pandas as pd
+
+TIMESTAMP_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+# Longest matching value is 22 bytes; one more byte detects longer values.
+_WIDTH = 23
+
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 of proleptic Gregorian dates (H. Hinnant's algorithm)."""
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def parse_timestamps(values):
+    """Parses `MM/DD/YYYY h:mm:ss AM` strings into a datetime64[s] Series."""
+    series = pd.Series(values)
+    codes, uniques = pd.factorize(series)
+    # Missing values have code -1, which picks the trailing NaT.
+    parsed = np.append(_parse_strings(np.asarray(uniques, dtype=str)), np.datetime64('NaT'))
+    return pd.Series(parsed[codes], index=series.index, name=series.name)
+
+
+def _parse_strings(text):
+    try:
+        raw = text.astype('S{}'.format(_WIDTH)).view(np.uint8).reshape(len(text), _WIDTH)
+    except UnicodeEncodeError:
+        # Non-ASCII text cannot match the layout.
+        return pd.to_datetime(text, format=TIMESTAMP_FORMAT, errors='coerce').to_numpy(dtype='datetime64[s]')
+    digits = raw.astype(np.int64) - ord('0')
+
+    # Everything after the date shifts right by one for two-digit hours.
+    shift = (raw[:, 12] != ord(':')).astype(np.int64)
+    rows = np.arange(len(text))
+
+    def at(position):
+        return raw[rows, position + shift]
+
+    def number(position):
+        return digits[rows, position + shift] * 10 + digits[rows, position + 1 + shift]
+
+    month = digits[:, 0] * 10 + digits[:, 1]
+    day = digits[:, 3] * 10 + digits[:, 4]
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    hour = np.where(shift == 1, digits[:, 11] * 10 + digits[:, 12], digits[:, 11])
+    minute = number(13)
+    second = number(16)
+    meridiem = at(19)
+
+    def is_digit(values):
+        return (values >= 0) & (values <= 9)
+
+    # Impossible dates such as 02/30 go to the fallback, which rejects them,
+    # instead of rolling over into the next month.
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_length = _DAYS_IN_MONTH[np.clip(month, 0, 12)] + ((month == 2) & leap)
+
+    valid = (
+        (raw[:, 2] == ord('/')) & (raw[:, 5] == ord('/')) & (raw[:, 10] == ord(' '))
+        & (at(12) == ord(':')) & (at(15) == ord(':')) & (at(18) == ord(' '))
+        & ((meridiem == ord('A')) | (meridiem == ord('P'))) & (at(20) == ord('M')) & (at(21) == 0)
+        & is_digit(digits[:, [0, 1, 3, 4, 6, 7, 8, 9, 11]]).all(axis=1)
+        & is_digit(digits[rows, 11 + shift])
+        & is_digit(digits[rows[:, np.newaxis], np.add.outer(shift, [13, 14, 16, 17])]).all(axis=1)
+        & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_length)
+        & (hour >= 1) & (hour <= 12) & (minute < 60) & (second < 60)
+    )
+
+    hour = hour % 12 + np.where(meridiem == ord('P'), 12, 0)
+    epoch_seconds = (
+        _days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second
+    )
+    parsed = epoch_seconds.astype('datetime64[s]')
+    if not valid.all():
+        fallback = pd.to_datetime(text[~valid], format=TIMESTAMP_FORMAT, errors='coerce')
+        parsed[~valid] = fallback.to_numpy(dtype='datetime64[s]')
+    return parsed
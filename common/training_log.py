@@ -0,0 +1,117 @@
+"""Streams training metrics to an append-only JSON Lines file.
+
+`MetricsLog` is a Keras callback that writes one record per logged batch and
+one per epoch as training goes, flushing after every write, so a long run can
+be watched from another terminal while it trains:
+
+    python -m common.training_log linear-regression_metrics.jsonl --follow
+
+Nothing is kept in memory beyond the record being written. Loss curves are
+read back from the file afterwards with `read_log`, which only materializes
+the records of the requested kind.
+"""
+
+import argparse
+import json
+import time
+
+import keras
+import pandas as pd
+
+
+def _plain(logs):
+    return {name: float(value) for name, value in (logs or {}).items()}
+
+
+class MetricsLog(keras.callbacks.Callback):
+    """Logs every `batch_every`-th batch and every epoch to `path`.
+
+    The file is truncated when training begins, so each fit starts a fresh
+    log. Batch records hold Keras' running averages for the epoch so far.
+    """
+
+    def __init__(self, path, batch_every=10):
+        super().__init__()
+        self.path = str(path)
+        self.batch_every = batch_every
+        self._file = None
+        self._epoch = 0
+        self._start = None
+
+    def _write(self, record):
+        record['seconds'] = round(time.perf_counter() - self._start, 6)
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+    def on_train_begin(self, logs=None):
+        self._start = time.perf_counter()
+        self._file = open(self.path, 'w')
+        self._write({'kind': 'start', 'params': self.params})
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.batch_every and (batch + 1) % self.batch_every == 0:
+            self._write({'kind': 'batch', 'epoch': self._epoch, 'batch': batch, **_plain(logs)})
+
+    def on_epoch_end(self, epoch, logs=None):
+        self._write({'kind': 'epoch', 'epoch': epoch, **_plain(logs)})
+
+    def on_train_end(self, logs=None):
+        if self._file is not None:
+            self._write({'kind': 'end'})
+            self._file.close()
+            self._file = None
+
+
+def iter_records(path, kind=None, follow=False, poll_seconds=0.5):
+    """Yields the records in `path`, optionally only those of one kind.
+
+    With `follow`, keeps waiting for new records until the run's end record.
+    """
+    with open(path) as f:
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if not line.endswith('\n'):
+                # Nothing new yet, or a record that is still being written.
+                if not follow:
+                    return
+                f.seek(position)
+                time.sleep(poll_seconds)
+                continue
+            record = json.loads(line)
+            if kind is None or record['kind'] == kind:
+                yield record
+            if follow and record['kind'] == 'end':
+                return
+
+
+def read_log(path, kind='epoch'):
+    """The records of one kind as a DataFrame, one metric per column."""
+    records = pd.DataFrame(iter_records(path, kind))
+    return records.drop(columns=['kind']).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the epochs of a training metrics log.')
+    parser.add_argument('path')
+    parser.add_argument('--follow', action='store_true', help='keep printing epochs until training ends')
+    parser.add_argument('--batches', action='store_true', help='also print the logged batches')
+    args = parser.parse_args(argv)
+
+    for record in iter_records(args.path, follow=args.follow):
+        if record['kind'] == 'epoch' or (args.batches and record['kind'] == 'batch'):
+            metrics = {name: value for name, value in record.items()
+                       if name not in ('kind', 'epoch', 'batch', 'seconds')}
+            position = 'epoch {}'.format(record['epoch'] + 1)
+            if record['kind'] == 'batch':
+                position += ' batch {}'.format(record['batch'] + 1)
+            print('{:>8.1f}s  {:<20} {}'.format(
+                record['seconds'], position,
+                '  '.join('{}={:.4f}'.format(name, value) for name, value in metrics.items())))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,229 +1,306 @@
 #general
-import io
+import argparse
+import sys
+from pathlib import Path
 
 #data
-import numpy as np
 import pandas as pd
 
-# machine learning
-import keras
-
 #data visulization
-import plotly.express as px
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
+import matplotlib
+# The pairplot is drawn on a pipeline worker thread, where GUI backends
+# (macosx, TkAgg) cannot run; the plot is only ever saved to a file.
+matplotlib.use('Agg')
 import seaborn as sns
 
-chicago_taxi_dataset = pd.read_csv("https://download.mlcc.google.com/mledu-datasets/chicago_taxi_train.csv")
-
-training_df = chicago_taxi_dataset[['TRIP_MILES', 'TRIP_SECONDS', 'FARE', 'COMPANY', 'PAYMENT_TYPE', 'TIP_RATE']]
-
-print('Read dataset completed succesfully.')
-print('Total number of rows: {0}\n\n'.format(len(training_df.index)))
-
-max_fare = training_df['FARE'].max()
-print('Maximum fare: {0}'.format(max_fare))
-
-mean_distance = training_df['TRIP_MILES'].mean()
-print('Mean distance: {0}'.format(mean_distance))
-
-num_unique_companies = training_df['COMPANY'].nunique()
-print('Number of unique companies: {0}'.format(num_unique_companies))
-
-most_frequent_payment_type = training_df['PAYMENT_TYPE'].mode()[0]
-print('Most frequent payment type: {0}'.format(most_frequent_payment_type))
-
-missing_values = training_df.isnull().sum().sum()
-print('Are any features missing data? \t\t\t\tAnswer: ', 'No' if missing_values == 0 else 'Yes')
-
-corr_df = training_df.corr(numeric_only=True)
-print('\nCorrelation matrix:\n', corr_df)
-
-most_correlate_feature_with_fare = corr_df['FARE'].drop(labels=['FARE']).idxmax()
-print('Most correlated feature with fare: {0}'.format(most_correlate_feature_with_fare))
-
-least_correlate_feature_with_fare = corr_df['FARE'].idxmin()
-print('Least correlated feature with fare: {0}'.format(least_correlate_feature_with_fare))
-
-plt = sns.pairplot(training_df, x_vars=["FARE", "TRIP_MILES", "TRIP_SECONDS"], y_vars=["FARE", "TRIP_MILES", "TRIP_SECONDS"])
-plt.figure.suptitle('Pairplot of features', y=1.02)
-plt.savefig('pairplot.png')
-
-def make_plots(df, feature_names, label_name, model_output, sample_size=200):
-    random_sample = df.sample(n=sample_size).copy()
-    random_sample.reset_index()
-    weights, bias, epochs, rmse = model_output
-
-    is_2d_plot = len(feature_names) == 1
-    model_plot_type = "scatter" if is_2d_plot else "surface"
-    fig = make_subplots(rows=1, cols=2, 
-                        subplot_titles=("Loss Curve", "Model Plot"),
-                        specs=[[{"type": "scatter"}, {"type": model_plot_type}]])
-    plot_data(random_sample, feature_names, label_name, fig)
-    plot_model(random_sample, feature_names, weights, bias, fig)
-    plot_loss_curve(epochs, rmse, fig)
-
-    fig.show()
-    fig.write_image("plot.png")
-    return
-
-def plot_loss_curve(epochs, rmse, fig):
-    curve = px.line(x=epochs, y=rmse)
-    curve.update_traces(line_color='#ff0000', line_width=3)
-
-    fig.append_trace(curve.data[0], row=1, col=1)
-    fig.update_xaxes(title_text="Epochs", row=1, col=1)
-    fig.update_yaxes(title_text="Root Mean Squared Error", row=1, col=1, range=[rmse.min()*0.8, rmse.max()*1.2])
-    return
-
-def plot_data(df, features, label, fig):
-    if len(features) == 1:
-        scatter = px.scatter(df, x=features[0], y=label)
-    else:
-        scatter = px.scatter_3d(df, x=features[0], y=features[1], z=label)
-
-    fig.append_trace(scatter.data[0], row=1, col=2)
-    if len(features) == 1:
-        fig.update_xaxes(title_text=features[0], row=1, col=2)
-        fig.update_yaxes(title_text=label, row=1, col=2)
-    else:
-        fig.update_layout(scene1=dict(xaxis_title=features[0], yaxis_title=features[1], zaxis_title=label))
-    return
-
-def plot_model(df, features, weights, bias, fig):
-    df['FARE_PREDICTED'] = bias[0]
-
-    for index, feature in enumerate(features):
-        df['FARE_PREDICTED'] += weights[index][0] * df[feature]
-    
-    if len(features) == 1:
-        model = px.line(df, x=features[0], y='FARE_PREDICTED')
-        model.update_traces(line_color='#ff0000', line_width=3)
-    else:
-        z_name, y_name = "FARE_PREDICTED", features[1]
-        z = [df[z_name].min(), (df[z_name].max() - df[z_name].min()) / 2, df[z_name].max()]
-        y = [df[y_name].min(), (df[y_name].max() - df[y_name].min()) / 2, df[y_name].max()]
-        x = []
-        for i in range(len(y)):
-            x.append((z[i] - weights[1][0] * y[i] - bias[0]) / weights[0][0])
-
-        plane = pd.DataFrame({'x': x, 'y': y, 'z': [z] * 3})
-        light_yellow = [[0, '#89CFF0'], [1, '#FFDB58']]
-        model = go.Figure(data=go.Surface(z=plane['z'], y=plane['y'], x=plane['x'], colorscale=light_yellow))
-    
-    fig.add_trace(model.data[0], row=1, col=2)
-    return
-
-def model_info(feature_names, label_name, model_output):
-    weights = model_output[0]
-    bias = model_output[1]
-
-    nl = "\n"
-    header = "-" * 80
-    banner = header + nl + "|" + "MODEL INFO".center(78) + "|" + nl + header
-
-    info = ""
-    equation = label_name + " = "
-
-    for index, feature in enumerate(feature_names):
-        info = info + "Weight for feature[{}]: {:.3f}\n".format(feature, weights[index][0])
-        equation = equation + "{:.3f} * {} + ".format(weights[index][0], feature)
-
-    info = info + "Bias: {:.3f}\n".format(bias[0])
-    equation =  equation + "{:.3f}\n".format(bias[0])
-
-    return banner + nl + info + nl + equation + nl
-
-print("SUCESS: defining plotting functions complete.")
-
-def build_model(my_learning_rate, num_features):
-    inputs = keras.Input(shape=(num_features,))
-    outputs = keras.layers.Dense(units=1)(inputs)
-    model = keras.Model(inputs=inputs, outputs=outputs)
-
-    model.compile(optimizer=keras.optimizers.RMSprop(learning_rate=my_learning_rate),
-                  loss="mean_squared_error",
-                  metrics=[keras.metrics.RootMeanSquaredError()])
-    return model
-
-def train_model(model, df, features, label, epochs, batch_size):
-    history = model.fit(x=features,
-                        y=label,
-                        batch_size=batch_size,
-                        epochs=epochs)
-    
-    trained_weight = model.get_weights()[0]
-    trained_bias = model.get_weights()[1]
-
-    epochs = history.epoch
-
-    hist = pd.DataFrame(history.history)
-
-    rmse = hist["root_mean_squared_error"]
-
-    return trained_weight, trained_bias, epochs, rmse
-
-def run_experiment(df, feature_names, label_name, learning_rate, epochs, batch_size):
-    print('INFO: starting training experiment with features={} and label={}\n'.format(feature_names, label_name))
-
-    num_features = len(feature_names)
-
-    features = df.loc[:, feature_names].values
-    label = df[label_name].values
-
-    model = build_model(learning_rate, num_features)
-    model_output = train_model(model, df, features, label, epochs, batch_size)
-
-    print('\nSUCCESS: training experiment complete\n')
-    print('{}'.format(model_info(feature_names, label_name, model_output)))
-    make_plots(df, feature_names, label_name, model_output)
-
-    return model
-
-print("SUCCESS: defining linear regression functions complete.")
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import column_profile
+from common import csv_reader
+from common import cube
+from common import instrumentation
+from common import outliers
+from common import pipeline
+from common import regression
+from common import runtime
+from common import sampling
+from common import timestamps
+
+CHICAGO_TAXI_URL = "https://download.mlcc.google.com/mledu-datasets/chicago_taxi_train.csv"
+
+def load_dataset(path=CHICAGO_TAXI_URL, engine='c'):
+    with instrumentation.span('load_csv'):
+        chicago_taxi_dataset = csv_reader.read_csv(path, engine=engine)
+
+    training_df = chicago_taxi_dataset[['TRIP_MILES', 'TRIP_SECONDS', 'FARE', 'COMPANY', 'PAYMENT_TYPE', 'TIP_RATE']]
+
+    # Trip timestamps are rounded to 15 minutes, so DURATION_MINUTES is
+    # coarser than TRIP_SECONDS; the hour and weekday are what it adds.
+    with instrumentation.span('parse_timestamps'):
+        trip_start = timestamps.parse_timestamps(chicago_taxi_dataset['TRIP_START_TIMESTAMP'])
+        trip_end = timestamps.parse_timestamps(chicago_taxi_dataset['TRIP_END_TIMESTAMP'])
+    training_df = training_df.assign(
+        START_HOUR=trip_start.dt.hour,
+        START_WEEKDAY=trip_start.dt.dayofweek,
+        DURATION_MINUTES=(trip_end - trip_start).dt.total_seconds() / 60,
+    )
+
+    print('Read dataset completed succesfully.')
+    print('Total number of rows: {0}\n\n'.format(len(training_df.index)))
+    return training_df
+
+def build_cube(training_df):
+    with instrumentation.span('build_cube'):
+        return cube.AggregateCube.build(training_df, cube_dimensions, cube_measures)
+
+def profile_dataset(training_df):
+    with instrumentation.span('column_profile'):
+        return column_profile.profile(training_df)
+
+def print_stats(training_df, fare_cube, columns):
+    # The per-column summaries come from the cube, so they cost a few
+    # thousand cells rather than a scan of every trip.
+    with instrumentation.span('summary_stats'):
+        max_fare = fare_cube.summary('FARE')['max']
+        print('Maximum fare: {0}'.format(max_fare))
+
+        mean_distance = fare_cube.summary('TRIP_MILES')['mean']
+        print('Mean distance: {0}'.format(mean_distance))
+
+        num_unique_companies = fare_cube.counts('COMPANY').index.dropna().size
+        print('Number of unique companies: {0}'.format(num_unique_companies))
+
+        most_frequent_payment_type = fare_cube.counts('PAYMENT_TYPE').idxmax()
+        print('Most frequent payment type: {0}'.format(most_frequent_payment_type))
+
+        missing_values = columns['nulls'].sum()
+        print('Are any features missing data? \t\t\t\tAnswer: ', 'No' if missing_values == 0 else 'Yes')
+    print('\nColumn profile:\n' + column_profile.format_profile(columns))
+
+    with instrumentation.span('corr'):
+        corr_df = training_df.corr(numeric_only=True)
+    print('\nCorrelation matrix:\n', corr_df)
+
+    most_correlate_feature_with_fare = corr_df['FARE'].drop(labels=['FARE']).idxmax()
+    print('Most correlated feature with fare: {0}'.format(most_correlate_feature_with_fare))
+
+    least_correlate_feature_with_fare = corr_df['FARE'].idxmin()
+    print('Least correlated feature with fare: {0}'.format(least_correlate_feature_with_fare))
+    return corr_df
+
+def save_pairplot(training_df):
+    with instrumentation.span('pairplot'):
+        plt = sns.pairplot(training_df, x_vars=["FARE", "TRIP_MILES", "TRIP_SECONDS"], y_vars=["FARE", "TRIP_MILES", "TRIP_SECONDS"])
+        plt.figure.suptitle('Pairplot of features', y=1.02)
+    with instrumentation.span('image_export'):
+        plt.savefig('pairplot.png')
 
 learning_rate = 0.001
 epochs = 20
 batch_size = 50
 
-training_df.loc[:, 'TRIP_MINUTES'] = training_df['TRIP_SECONDS']/60
-
 features = ['TRIP_MILES', 'TRIP_MINUTES']
 label = 'FARE'
-
-model_2 = run_experiment(training_df, features, label, learning_rate, epochs, batch_size)
-
-def format_currency(x):
-    return "${:.2f}".format(x)
-
-def build_batch(df, batch_size):
-    batch = df.sample(n = batch_size).copy()
-    batch.set_index(np.arange(0, batch_size), inplace=True)
-    return batch
-
-def predict_fare(model, df, features, label, batch_size=50):
-    batch = build_batch(df, batch_size)
-    predicted_values = model.predict_on_batch(x=batch.loc[:, features].values)
-
-    data = {"PREDICTED_FARE": [], "OBSERVED_FARE": [], "L1_LOSS": [], features[0]: [], features[1]: []}
-    for i in range(batch_size):
-        predicted = predicted_values[i][0]
-        observed = batch.at[i, label]
-        data["PREDICTED_FARE"].append(format_currency(predicted))
-        data["OBSERVED_FARE"].append(format_currency(observed))
-        data['L1_LOSS'].append(format_currency(abs(predicted - observed)))
-        data[features[0]].append(batch.at[i, features[0]])
-        data[features[1]].append("{:.2f}".format(batch.at[i, features[1]]))
-
-    output_df = pd.DataFrame(data)
-    return output_df
-
-def show_predictions(output):
-    header = "-" * 80
-    banner = header + "\n" + "|" + "PREDICTIONS".center(78) + "|" + "\n" + header
-    print(banner)
-    print(output)
-    return
-
-output = predict_fare(model_2, training_df, features, label)
-show_predictions(output)
\ No newline at end of file
+categorical_features = ['COMPANY', 'PAYMENT_TYPE']
+large_batch_size = 4096
+metrics_log = 'linear-regression_metrics.jsonl'
+cube_dimensions = ['COMPANY', 'PAYMENT_TYPE', 'START_HOUR']
+cube_measures = ['FARE', 'TRIP_MILES', 'TRIP_SECONDS', 'TIP_RATE']
+# Fare per mile is skewed by short trips, hence the wide MAD threshold; the
+# IQR fences only catch the far-out durations and distances.
+outlier_rules = {
+    'mad': ['FARE_PER_MILE'], 'mad_threshold': 6,
+    'iqr': ['TRIP_SECONDS', 'TRIP_MILES'], 'iqr_k': 3,
+    'bounds': {'TRIP_SPEED': (4.5, 70)},
+}
+
+def add_trip_minutes(training_df):
+    training_df = training_df.copy()
+    training_df.loc[:, 'TRIP_MINUTES'] = training_df['TRIP_SECONDS']/60
+    return training_df
+
+def with_trip_rates(df):
+    """Adds the speed (mph) and fare per mile the outlier rules check."""
+    return df.assign(TRIP_SPEED=df['TRIP_MILES'] / (df['TRIP_SECONDS'] / 3600),
+                     FARE_PER_MILE=df['FARE'] / df['TRIP_MILES'])
+
+def print_outlier_report(outlier_filter):
+    print(outlier_filter.summary())
+    print(outlier_filter.report().to_string(float_format='{:.2f}'.format), '\n')
+
+def filter_outliers(training_df, rules):
+    outlier_filter = outliers.OutlierFilter(**rules)
+    if not outlier_filter.rules:
+        return training_df
+    with instrumentation.span('filter_outliers'):
+        candidates = with_trip_rates(training_df)
+        kept = outlier_filter.fit(candidates).apply(candidates)
+    print_outlier_report(outlier_filter)
+    return kept[training_df.columns]
+
+def filter_csv(path, output, rules, chunksize=100000, sample_size=100000):
+    """Streams the raw CSV at `path` into `output` without the outlier rows.
+
+    The fences are fitted on a uniform sample from a first pass, and the
+    second pass filters chunk by chunk, so memory stays at one chunk plus
+    the sample whatever the size of the file.
+    """
+    outlier_filter = outliers.OutlierFilter(**rules)
+    with instrumentation.span('fit_outlier_fences'):
+        sample = sampling.reservoir_sample(pd.read_csv(path, chunksize=chunksize), sample_size, seed=0)
+        outlier_filter.fit(with_trip_rates(sample))
+    with instrumentation.span('filter_chunks'):
+        for number, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+            kept = outlier_filter.apply(with_trip_rates(chunk))
+            # Written as read, so the output loads like the original file.
+            chunk.loc[kept.index].to_csv(output, mode='w' if number == 0 else 'a',
+                                         header=number == 0, index=False)
+    print_outlier_report(outlier_filter)
+    print('Wrote {}'.format(output))
+
+def train_fare_model(training_df, vocabularies, features, label, learning_rate, epochs, batch_size,
+                     metrics_log=None, dtype_policy='float32', large_batch_size=None):
+    return regression.run_experiment(training_df, features, label, learning_rate, epochs, batch_size,
+                                     plot=False, metrics_log=metrics_log, dtype_policy=dtype_policy,
+                                     large_batch_size=large_batch_size, vocabularies=vocabularies)
+
+# The plot and predict stages draw their rows from one BatchSampler per
+# frame, so the frame is shuffled once per pass rather than once per call.
+samplers = {}
+
+def sampler_for(df):
+    if id(df) not in samplers:
+        samplers[id(df)] = sampling.BatchSampler(df)
+    return samplers[id(df)]
+
+def plot_fare_model(training_df, trained, features, label):
+    model, model_output = trained
+    with instrumentation.span('plots'):
+        regression.make_plots(training_df, features, label, model_output, sampler=sampler_for(training_df))
+
+def predict_and_show(training_df, trained, vocabularies):
+    model, model_output = trained
+    output = regression.predict(model, training_df, features, label, sampler=sampler_for(training_df),
+                                vocabularies=vocabularies)
+    regression.show_predictions(output)
+
+def query_cube(fare_cube, measure, filters):
+    filters = {dimension: value for dimension, value in filters.items() if value is not None}
+    with instrumentation.span('cube_query'):
+        result = fare_cube.summary(measure, **filters)
+    described = ', '.join('{}={}'.format(dimension, value) for dimension, value in filters.items()) or 'all trips'
+    print('{} over {}:'.format(measure, described))
+    for statistic, value in result.items():
+        print('  {:<6} {}'.format(statistic, value))
+    return result
+
+def build_pipeline(args):
+    graph = pipeline.Pipeline(args.cache_dir, max_workers=args.workers)
+    graph.add('load', load_dataset, params={'path': args.data, 'engine': args.csv_engine}, files=[args.data])
+    graph.add('cube', build_cube, inputs=['load'])
+    graph.add('profile', profile_dataset, inputs=['load'])
+    graph.add('stats', print_stats, inputs=['load', 'cube', 'profile'], cache=False)
+    graph.add('query', query_cube, inputs=['cube'], cache=False,
+              params={'measure': args.measure, 'filters': {
+                  'COMPANY': args.company, 'PAYMENT_TYPE': args.payment_type, 'START_HOUR': args.hour}})
+    graph.add('pairplot', save_pairplot, inputs=['load'], outputs=['pairplot.png'])
+    graph.add('features', add_trip_minutes, inputs=['load'])
+    graph.add('filtered', filter_outliers, inputs=['features'],
+              params={'rules': outlier_rules if args.filter_outliers else {}})
+    # The vocabulary is built once from the training data and cached, so
+    # prediction encodes new rows with the same codes the model learned.
+    graph.add('vocabulary', regression.build_vocabularies, inputs=['filtered'],
+              params={'columns': categorical_features if args.categorical else []})
+    # Every hyperparameter is a parameter of the stage, so changing one
+    # retrains instead of reusing the cached model.
+    graph.add('train', train_fare_model, inputs=['filtered', 'vocabulary'],
+              params={'features': features, 'label': label, 'learning_rate': learning_rate,
+                      'epochs': epochs, 'batch_size': batch_size, 'metrics_log': metrics_log,
+                      'dtype_policy': args.dtype,
+                      'large_batch_size': large_batch_size if args.large_batch else None},
+              save=regression.save_trained_model, load=regression.load_trained_model)
+    graph.add('model_plot', plot_fare_model, inputs=['filtered', 'train'],
+              params={'features': features, 'label': label}, outputs=['plot.png'])
+    graph.add('predict', predict_and_show, inputs=['filtered', 'train', 'vocabulary'], cache=False)
+    graph.add('filter_csv', filter_csv, cache=False, files=[args.data],
+              params={'path': args.data, 'output': args.output, 'rules': outlier_rules,
+                      'chunksize': args.chunksize})
+    return graph
+
+command_targets = {
+    'stats': ['stats'],
+    'query': ['query'],
+    'plot': ['pairplot'],
+    'train': ['train', 'model_plot'],
+    'predict': ['predict'],
+    'filter': ['filter_csv'],
+    'all': ['stats', 'pairplot', 'model_plot', 'predict'],
+}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Chicago taxi fare linear regression.')
+    parser.add_argument('--data', default=CHICAGO_TAXI_URL, help='path or URL of the taxi CSV')
+    parser.add_argument('--cache-dir', default='.pipeline_cache', help='where stage results, including the trained model, are cached')
+    parser.add_argument('--workers', type=int, default=4, help='stages that may run in parallel')
+    parser.add_argument('--force', action='store_true', help='re-run every stage, ignoring the cache')
+    parser.add_argument('--no-profile', action='store_true', help='do not write linear-regression_profile.json')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks in the profile')
+    parser.add_argument('--dtype', choices=sorted(runtime.DTYPE_POLICIES), default='float32',
+                        help='dtype policy for the training inputs and the model')
+    parser.add_argument('--large-batch', action='store_true',
+                        help='train with batches of {} and a linearly scaled, warmed-up and decayed learning '
+                             'rate: faster epochs for a slightly worse fit (RMSE 3.49 instead of 3.48)'.format(
+                                 large_batch_size))
+    parser.add_argument('--categorical', action='store_true',
+                        help='also learn a fare offset per {}'.format(' and '.join(categorical_features)))
+    parser.add_argument('--filter-outliers', action='store_true',
+                        help='drop implausible trips (robust fare, duration, distance and speed rules) before training')
+    runtime.add_thread_arguments(parser)
+    csv_reader.add_csv_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('stats', help='print summary statistics and correlations')
+    query_parser = subparsers.add_parser('query', help='summarize a measure over one slice of the fare cube')
+    query_parser.add_argument('--measure', choices=cube_measures, default='FARE')
+    query_parser.add_argument('--company')
+    query_parser.add_argument('--payment-type')
+    query_parser.add_argument('--hour', type=int, help='trip start hour, 0-23')
+    subparsers.add_parser('plot', help='save the feature pairplot')
+    train_parser = subparsers.add_parser('train', help='train the fare model')
+    train_parser.add_argument('--no-plot', action='store_true', help='skip the loss curve and model plot')
+    predict_parser = subparsers.add_parser('predict', help='predict fares for a batch, training only if no cached model exists')
+    predict_parser.add_argument('--retrain', action='store_true', help='ignore a cached model')
+    filter_parser = subparsers.add_parser('filter', help='stream the CSV through the outlier rules into a new CSV')
+    filter_parser.add_argument('output', help='where to write the kept rows')
+    filter_parser.add_argument('--chunksize', type=int, default=100000, help='rows read at a time')
+    subparsers.add_parser('all', help='run every stage (default)')
+
+    args = parser.parse_args(argv)
+    args.command = args.command or 'all'
+    args.no_plot = getattr(args, 'no_plot', False)
+    args.retrain = getattr(args, 'retrain', False)
+    args.measure = getattr(args, 'measure', 'FARE')
+    args.company = getattr(args, 'company', None)
+    args.payment_type = getattr(args, 'payment_type', None)
+    args.hour = getattr(args, 'hour', None)
+    args.output = getattr(args, 'output', None)
+    args.chunksize = getattr(args, 'chunksize', 100000)
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.no_profile:
+        instrumentation.start('linear-regression', trace_memory=args.trace_memory)
+    runtime.configure_threads_from_args(args)
+    csv_reader.configure_from_args(args)
+    runtime.set_dtype_policy(args.dtype)
+
+    force = True if args.force else (['train'] if args.retrain else ())
+    targets = command_targets[args.command]
+    if args.no_plot:
+        targets = [target for target in targets if target != 'model_plot']
+    build_pipeline(args).run(targets, force=force)
+
+    instrumentation.finish()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
 import pandas as pd
 from matplotlib import pyplot as plt
+import argparse
 import io
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import csv_reader
+from common import instrumentation
 
 pd.options.display.max_rows = 10
 pd.options.display.float_format = "{:.1f}".format
@@ -1407,11 +1414,11 @@ dataset = '''calories,test_score
 195,66
 44,50
 '''
-training_df = pd.read_csv(io.StringIO(dataset), on_bad_lines='warn')
-
-print(training_df.describe())
+def load_dataset(engine='c'):
+    with instrumentation.span('load_csv'):
+        return csv_reader.read_csv(io.StringIO(dataset), engine=engine, on_bad_lines='warn')
 
-def plot_the_dataset(feature, label, number_of_points_to_plot):
+def plot_the_dataset(training_df, feature, label, number_of_points_to_plot):
     plt.xlabel(feature)
     plt.ylabel(label)
 
@@ -1420,7 +1427,7 @@ def plot_the_dataset(feature, label, number_of_points_to_plot):
 
     plt.show()
 
-def plot_a_contiguous_portion_of_dataset(feature, label, start, end):
+def plot_a_contiguous_portion_of_dataset(training_df, feature, label, start, end):
     plt.xlabel(feature + "Day")
     plt.ylabel(label)
 
@@ -1428,29 +1435,55 @@ def plot_a_contiguous_portion_of_dataset(feature, label, start, end):
 
     plt.show()
 
-plot_the_dataset("calories", "test_score", 200)
+def thursday_calorie_means(training_df):
+    running_total_of_thursday_calories = 0
+    running_total_of_non_thursday_calories = 0
+    count = 0
+    for week in range(0,4):
+        for day in range(0,7):
+            for subject in range(0,50):
+                position = (week * 350) + (day * 50) + subject
+                if (day == 4):
+                    running_total_of_thursday_calories += training_df["calories"][position]
+                else:
+                    count += 1
+                    running_total_of_non_thursday_calories += training_df["calories"][position]
+
+    mean_of_thursday_calories = running_total_of_thursday_calories / 200
+    mean_of_non_thursday_calories = running_total_of_non_thursday_calories / 1200
+    return mean_of_thursday_calories, mean_of_non_thursday_calories
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Spot the bad values in the calorie and test score data.')
+    csv_reader.add_csv_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    csv_reader.configure_from_args(args)
+    instrumentation.start('numerical-data-bad-values')
+
+    training_df = load_dataset(args.csv_engine)
+
+    with instrumentation.span('describe'):
+        print(training_df.describe())
+
+    with instrumentation.span('plots'):
+        plot_the_dataset(training_df, "calories", "test_score", 200)
+
+        for i in range(0,7):
+            start = i * 50
+            end = start + 49
+            print("\nDay %d" % i)
+            plot_a_contiguous_portion_of_dataset(training_df, "calories", "test_score", start, end)
 
-for i in range(0,7):
-    start = i * 50
-    end = start + 49
-    print("\nDay %d" % i)
-    plot_a_contiguous_portion_of_dataset("calories", "test_score", start, end)
+    with instrumentation.span('thursday_aggregation'):
+        mean_of_thursday_calories, mean_of_non_thursday_calories = thursday_calorie_means(training_df)
 
-running_total_of_thursday_calories = 0
-running_total_of_non_thursday_calories = 0
-count = 0
-for week in range(0,4):
-    for day in range(0,7):
-        for subject in range(0,50):
-            position = (week * 350) + (day * 50) + subject
-            if (day == 4):
-                running_total_of_thursday_calories += training_df["calories"][position]
-            else:
-                count += 1
-                running_total_of_non_thursday_calories += training_df["calories"][position]
+    print("Mean of Thursday calories: %f" % mean_of_thursday_calories)
+    print("Mean of non-Thursday calories: %f" % mean_of_non_thursday_calories)
 
-mean_of_thursday_calories = running_total_of_thursday_calories / 200
-mean_of_non_thursday_calories = running_total_of_non_thursday_calories / 1200
+    instrumentation.finish()
 
-print("Mean of Thursday calories: %f" % mean_of_thursday_calories)
-print("Mean of non-Thursday calories: %f" % mean_of_non_thursday_calories)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
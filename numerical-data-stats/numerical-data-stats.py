@@ -1,8 +1,225 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import binning
+from common import csv_reader
+from common import instrumentation
+from common import pipeline
+from common import regression
+from common import runtime
+from common import sampling
+from common import spatial
+
 pd.options.display.max_rows = 10
 pd.options.display.float_format = "{:.1f}".format
 
-training_df = pd.read_csv("california_housing_train.csv")
+label = 'median_house_value'
+bucket_bins = {'latitude': 10, 'longitude': 10, 'median_income': 8}
+bucket_crosses = [('latitude', 'longitude')]
+
+# The model is trained on values in thousands of dollars, so the weights
+# and the RMSE read directly and RMSprop's step size fits the label scale.
+learning_rate = 0.05
+epochs = 20
+batch_size = 50
+features = ['median_income', 'cell_mean_value_k', 'housing_median_age']
+label_k = 'median_house_value_k'
+categorical_features = ['latitude_x_longitude']
+metrics_log = 'numerical-data-stats_metrics.jsonl'
+
+def load_dataset(path="california_housing_train.csv", engine='c'):
+    with instrumentation.span('load_csv'):
+        return csv_reader.read_csv(path, engine=engine)
+
+def build_spatial_index(training_df, cell_km):
+    with instrumentation.span('spatial_index'):
+        return spatial.GridIndex(training_df['longitude'], training_df['latitude'], cell_km=cell_km)
+
+def neighbourhood_features(training_df, index):
+    """Count and mean house value of the other blocks in each block's cell.
+
+    The block's own value is left out of the mean, so the feature can be
+    trained on without leaking the label; it is NaN for blocks alone in
+    their cell.
+    """
+    with instrumentation.span('neighbourhood_features'):
+        cells = index.cell_aggregates(training_df[label])
+        cell = index.cell_of(training_df['longitude'], training_df['latitude'])
+        count = cells['count'].reindex(cell).to_numpy()
+        total = cells['mean'].reindex(cell).to_numpy() * count
+        others = count - 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(others > 0, (total - training_df[label].to_numpy()) / others, np.nan)
+    return training_df.assign(cell_blocks=others, cell_mean_value=mean)
+
+def describe_dataset(training_df):
+    with instrumentation.span('describe'):
+        print(training_df.describe())
+
+def print_cells(training_df, index, cell_km):
+    print('\nCorrelation of {} with the mean of its {} km cell: {:.3f}'.format(
+        label, cell_km, training_df[label].corr(training_df['cell_mean_value'])))
+
+    cells = index.cell_aggregates(training_df[label])
+    print('\nMost expensive {} km cells (at least 20 blocks):'.format(cell_km))
+    print(cells[cells['count'] >= 20].nlargest(5, 'mean'))
+
+def fit_bucketizer(training_df, bins, crosses):
+    with instrumentation.span('bin_edges'):
+        return binning.Bucketizer.fit(training_df, bins, [tuple(pair) for pair in crosses])
+
+def add_buckets(training_df, bucketizer):
+    with instrumentation.span('bucketize'):
+        return training_df.join(bucketizer.transform(training_df))
+
+def print_buckets(training_df, bucketizer):
+    for column, edges in bucketizer.edges.items():
+        print('\n{} bucket edges: {}'.format(column, np.round(edges, 2).tolist()))
+    for first, second in bucketizer.crosses:
+        name = binning.cross_name(first, second)
+        values = training_df.groupby(name)[label].agg(['count', 'mean'])
+        print('\n{} of {} {} codes are used; most expensive:'.format(len(values), bucketizer.buckets(name), name))
+        print(values.nlargest(5, 'mean'))
+
+def prepare_training_data(training_df):
+    # Blocks alone in their cell have no neighbourhood mean; they get the
+    # overall mean instead.
+    cell_mean = training_df['cell_mean_value'].fillna(training_df[label].mean())
+    return training_df.assign(median_house_value_k=training_df[label] / 1000,
+                              cell_mean_value_k=cell_mean / 1000)
+
+def train_housing_model(training_df, vocabularies, features, label, learning_rate, epochs, batch_size,
+                        metrics_log=None, dtype_policy='float32'):
+    return regression.run_experiment(training_df, features, label, learning_rate, epochs, batch_size,
+                                     plot=False, metrics_log=metrics_log, dtype_policy=dtype_policy,
+                                     vocabularies=vocabularies)
+
+# The plot and predict stages draw their rows from one BatchSampler per
+# frame, so the frame is shuffled once per pass rather than once per call.
+samplers = {}
+
+def sampler_for(df):
+    if id(df) not in samplers:
+        samplers[id(df)] = sampling.BatchSampler(df)
+    return samplers[id(df)]
+
+def plot_housing_model(training_df, trained, features, label):
+    model, model_output = trained
+    with instrumentation.span('plots'):
+        regression.make_plots(training_df, features, label, model_output, sampler=sampler_for(training_df),
+                              path='housing_plot.png')
+
+def format_thousands(x):
+    return "${:.1f}k".format(x)
+
+def predict_and_show(training_df, trained, vocabularies):
+    model, model_output = trained
+    output = regression.predict(model, training_df, features, label_k, sampler=sampler_for(training_df),
+                                vocabularies=vocabularies, formatter=format_thousands)
+    regression.show_predictions(output)
+
+def print_neighbours(training_df, index, longitude, latitude, radius_km, k):
+    with instrumentation.span('radius_query'):
+        rows, distances = index.radius(longitude, latitude, radius_km)
+    print('\n{} blocks within {} km of ({}, {})'.format(len(rows), radius_km, longitude, latitude))
+    if len(rows):
+        print('Mean {}: {:.0f}'.format(label, training_df[label].to_numpy()[rows].mean()))
+
+    with instrumentation.span('nearest_query'):
+        rows, distances = index.nearest(longitude, latitude, k)
+    print('\n{} nearest blocks:'.format(k))
+    print(training_df.iloc[rows].assign(distance_km=distances)[['longitude', 'latitude', 'distance_km', label]])
+
+def build_pipeline(args):
+    graph = pipeline.Pipeline(args.cache_dir, max_workers=args.workers)
+    graph.add('load', load_dataset, params={'path': args.data, 'engine': args.csv_engine}, files=[args.data])
+    graph.add('describe', describe_dataset, inputs=['load'], cache=False)
+    graph.add('spatial_index', build_spatial_index, inputs=['load'], params={'cell_km': args.cell_km})
+    graph.add('neighbourhood', neighbourhood_features, inputs=['load', 'spatial_index'])
+    graph.add('cells', print_cells, inputs=['neighbourhood', 'spatial_index'],
+              params={'cell_km': args.cell_km}, cache=False)
+    # Quantile edges need every column sorted, so they are fitted once and
+    # cached; bucketizing with them is then one searchsorted per column.
+    graph.add('bin_edges', fit_bucketizer, inputs=['load'],
+              params={'bins': bucket_bins, 'crosses': bucket_crosses})
+    graph.add('features', add_buckets, inputs=['neighbourhood', 'bin_edges'])
+    graph.add('buckets', print_buckets, inputs=['features', 'bin_edges'], cache=False)
+    graph.add('training_data', prepare_training_data, inputs=['features'])
+    graph.add('vocabulary', regression.build_vocabularies, inputs=['training_data'],
+              params={'columns': categorical_features if args.categorical else []})
+    graph.add('train', train_housing_model, inputs=['training_data', 'vocabulary'],
+              params={'features': features, 'label': label_k, 'learning_rate': learning_rate,
+                      'epochs': epochs, 'batch_size': batch_size, 'metrics_log': metrics_log,
+                      'dtype_policy': args.dtype},
+              save=regression.save_trained_model, load=regression.load_trained_model)
+    graph.add('model_plot', plot_housing_model, inputs=['training_data', 'train'],
+              params={'features': features, 'label': label_k}, outputs=['housing_plot.png'])
+    graph.add('predict', predict_and_show, inputs=['training_data', 'train', 'vocabulary'], cache=False)
+    if args.near:
+        graph.add('near', print_neighbours, inputs=['load', 'spatial_index'], cache=False,
+                  params={'longitude': args.near[0], 'latitude': args.near[1],
+                          'radius_km': args.radius_km, 'k': args.k})
+    return graph
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Summary statistics of the California housing data.')
+    parser.add_argument('--data', default='california_housing_train.csv', help='path of the housing CSV')
+    parser.add_argument('--cache-dir', default='.pipeline_cache', help='where stage results are cached')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='stages that may run in parallel (more than one interleaves the reports)')
+    parser.add_argument('--force', action='store_true', help='re-run every stage, ignoring the cache')
+    parser.add_argument('--cell-km', type=float, default=5.0, help='side of the spatial index cells')
+    parser.add_argument('--near', nargs=2, type=float, metavar=('LONGITUDE', 'LATITUDE'),
+                        help='also list the blocks around this point')
+    parser.add_argument('--radius-km', type=float, default=5.0, help='radius of the --near query')
+    parser.add_argument('--k', type=int, default=10, help='nearest blocks listed by --near')
+    parser.add_argument('--dtype', choices=sorted(runtime.DTYPE_POLICIES), default='float32',
+                        help='dtype policy for the training inputs and the model')
+    parser.add_argument('--categorical', action='store_true',
+                        help='also learn a value offset per {} code'.format(' and '.join(categorical_features)))
+    runtime.add_thread_arguments(parser)
+    csv_reader.add_csv_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('stats', help='print the summary, cell and bucket reports (default)')
+    train_parser = subparsers.add_parser('train', help='train the {} model'.format(label))
+    train_parser.add_argument('--no-plot', action='store_true', help='skip the loss curve and model plot')
+    predict_parser = subparsers.add_parser('predict', help='predict values for a batch, training only if no cached model exists')
+    predict_parser.add_argument('--retrain', action='store_true', help='ignore a cached model')
+    subparsers.add_parser('all', help='run every stage')
+
+    args = parser.parse_args(argv)
+    args.command = args.command or 'stats'
+    args.no_plot = getattr(args, 'no_plot', False)
+    args.retrain = getattr(args, 'retrain', False)
+    return args
+
+command_targets = {
+    'stats': ['describe', 'cells', 'buckets'],
+    'train': ['train', 'model_plot'],
+    'predict': ['predict'],
+    'all': ['describe', 'cells', 'buckets', 'model_plot', 'predict'],
+}
+
+def main(argv=None):
+    args = parse_args(argv)
+    instrumentation.start('numerical-data-stats')
+    runtime.configure_threads_from_args(args)
+    csv_reader.configure_from_args(args)
+    runtime.set_dtype_policy(args.dtype)
+
+    force = True if args.force else (['train'] if args.retrain else ())
+    targets = command_targets[args.command] + (['near'] if args.near else [])
+    if args.no_plot:
+        targets = [target for target in targets if target != 'model_plot']
+    build_pipeline(args).run(targets, force=force)
+
+    instrumentation.finish()
 
-print(training_df.describe())
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from common import timestamps
+
+EDGE_CASES = [
+    '01/01/2020 12:00:00 AM',
+    '01/01/2020 12:00:00 PM',
+    '01/01/2020 12:59:59 AM',
+    '01/01/2020 1:05:09 AM',
+    '01/01/2020 1:05:09 PM',
+    '12/31/2019 11:59:59 PM',
+    '02/29/2020 3:15:00 PM',
+    '02/29/2000 3:15:00 PM',
+    '02/29/2019 3:15:00 PM',
+    '02/29/1900 3:15:00 PM',
+    '02/30/2020 1:00:00 AM',
+    '04/31/2020 1:00:00 AM',
+    '13/01/2020 1:00:00 AM',
+    '00/10/2020 1:00:00 AM',
+    '01/00/2020 1:00:00 AM',
+    '01/01/2020 0:00:00 AM',
+    '01/01/2020 13:00:00 PM',
+    '01/01/2020 1:60:00 AM',
+    '01/01/2020 1:00:60 AM',
+    '01/01/2020 1:00:00 XM',
+    '01/01/2020 1:00:00 AMX',
+    '01/01/2020 10:00:00 AM and more',
+    '01/01/2020',
+    '',
+    'not a timestamp',
+    '01/01/2020 1:00:00 AMé',
+]
+
+
+def expected(values):
+    return pd.to_datetime(pd.Series(values), format=timestamps.TIMESTAMP_FORMAT, errors='coerce')
+
+
+@pytest.mark.parametrize('value', EDGE_CASES)
+def test_matches_pandas(value):
+    parsed = timestamps.parse_timestamps([value])
+    assert parsed.equals(expected([value]).astype(parsed.dtype))
+
+
+def test_missing_values_are_nat():
+    values = ['01/01/2020 1:00:00 AM', np.nan, None, '01/01/2020 1:00:00 AM']
+    parsed = timestamps.parse_timestamps(values)
+    assert parsed.isna().tolist() == [False, True, True, False]
+    assert parsed.iloc[0] == parsed.iloc[3] == pd.Timestamp('2020-01-01 01:00:00')
+
+
+def test_mixed_column_matches_pandas():
+    values = pd.Series(EDGE_CASES * 3 + [np.nan], name='TRIP_START_TIMESTAMP')
+    parsed = timestamps.parse_timestamps(values)
+    assert parsed.name == values.name
+    assert parsed.equals(expected(values).astype(parsed.dtype))